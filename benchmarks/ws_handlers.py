@@ -0,0 +1,102 @@
+"""
+Messages per second of the websocket handlers with every installed JSON decoder.
+Run from the repository root: python -m benchmarks.ws_handlers
+"""
+import json
+import random
+import time
+from decimal import Decimal
+from threading import Lock
+
+from libs.exchanges.ws import decoder
+from libs.exchanges.ws.binance import Binance
+from libs.exchanges.ws.bybit.bybit_public import ByBitPublic
+from libs.objects.BookSide import BookSide
+
+MESSAGES = 20000
+LEVELS = 500
+MAX_DEPTH = 20
+
+
+def random_levels(count: int, start: float) -> list[list[str]]:
+    return [[f"{start + random.randint(-LEVELS, LEVELS) / 100:.2f}", random.choice(["0", "0.512", "3.020"])]
+            for _ in range(count)]
+
+
+def binance_messages() -> list[str]:
+    messages = []
+    update_id = 0
+    for idx in range(MESSAGES):
+        if idx % 10 == 0:
+            messages.append(json.dumps({"stream": "btcusdt@markPrice@1s",
+                                        "data": {"e": "markPriceUpdate", "s": "BTCUSDT", "r": "0.00010000"}}))
+            continue
+        update_id += 1
+        messages.append(json.dumps({"stream": "btcusdt@depth@100ms",
+                                    "data": {"e": "depthUpdate", "s": "BTCUSDT", "U": update_id, "u": update_id,
+                                             "pu": update_id - 1,
+                                             "b": random_levels(8, 95), "a": random_levels(8, 105)}}))
+    return messages
+
+
+def bybit_messages() -> list[str]:
+    messages = []
+    for idx in range(MESSAGES):
+        if idx % 10 == 0:
+            messages.append(json.dumps({"topic": "tickers.BTCUSDT", "type": "snapshot",
+                                        "data": {"symbol": "BTCUSDT", "fundingRate": "0.0001"}}))
+            continue
+        messages.append(json.dumps({"topic": "orderbook.50.BTCUSDT", "type": "delta",
+                                    "data": {"s": "BTCUSDT", "b": random_levels(8, 95), "a": random_levels(8, 105)}}))
+    return messages
+
+
+def seed_book(orderbook: dict, max_depth: int = None):
+    orderbook["bids"] = BookSide(True, [[Decimal(95) - Decimal(i) / 100, Decimal(1)] for i in range(LEVELS)],
+                                 max_depth)
+    orderbook["asks"] = BookSide(False, [[Decimal(105) + Decimal(i) / 100, Decimal(1)] for i in range(LEVELS)],
+                                 max_depth)
+    orderbook["timestamp"] = 0
+
+
+def binance_handler(max_depth: int = None) -> Binance:
+    handler = Binance("", "Binance", {}, {}, "BTCUSDT", Lock(), Lock(), "", "", Lock(), {}, "", max_depth=max_depth)
+    seed_book(handler.orderbook, max_depth)
+    handler.orderbook["lastUpdateId"] = 0
+    handler.updates = 1
+    return handler
+
+
+def bybit_handler(max_depth: int = None) -> ByBitPublic:
+    handler = ByBitPublic("", "ByBit", {}, {}, "BTCUSDT", Lock(), Lock(), "", "", Lock(), {}, "", max_depth=max_depth)
+    seed_book(handler.orderbook, max_depth)
+    return handler
+
+
+def measure(handler, messages: list[str]) -> float:
+    start = time.perf_counter()
+    for message in messages:
+        handler.on_message(message)
+    return len(messages) / (time.perf_counter() - start)
+
+
+def measure_decode(messages: list[str]) -> float:
+    start = time.perf_counter()
+    for message in messages:
+        decoder.loads(message)
+    return len(messages) / (time.perf_counter() - start)
+
+
+def main():
+    random.seed(1)
+    suites = {"Binance": (binance_handler, binance_messages()), "ByBit": (bybit_handler, bybit_messages())}
+    for name in decoder.decoders:
+        decoder.set_decoder(name)
+        for exchange, (create_handler, messages) in suites.items():
+            print(f"{name:7} {exchange:8} decode only {measure_decode(messages):10.0f} msg/s, "
+                  f"handler {measure(create_handler(), messages):10.0f} msg/s, "
+                  f"handler max_depth={MAX_DEPTH} {measure(create_handler(MAX_DEPTH), messages):10.0f} msg/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,22 @@
 import copy
 import datetime
-import hashlib
-import hmac
 import logging
-import time
 import uuid
 from decimal import Decimal
-from urllib.parse import urlencode
-
-import requests
 
+from libs.exchanges.request_engine import BinanceRequestEngine
 from libs.exchanges.ws.binance import Binance as BinanceWS
+from libs.exchanges.ws.binance_stream import BinanceStreamManager
+from libs.http_sessions import HttpSessions
+from libs.leverage_brackets import LeverageBrackets
+from libs.misc import seconds_to_funding_timeout
+from libs.objects.FixedPoint import FixedPoint
 from libs.objects.Income import Income
 from libs.objects.Order import Order
 from libs.objects.OrderInfo import OrderInfo
 from libs.objects.Position import Position
 from libs.objects.Trade import Trade
+from libs.symbols_metadata import SymbolsMetadata
 
 
 class Binance:
@@ -60,54 +61,41 @@ class Binance:
         self.__api_key = args["api_key"]
         self.__api_sec = args["api_sec"]
         self.__recv_window = args["recv_window"]
+        self.__session = HttpSessions.get_session("Binance")
         self.__base_url = args["base_url"]
-        self.__ws_url = args["websockets_base_url"]
+        self.__rest = BinanceRequestEngine(f"https://{self.__base_url}", self.__api_key, self.__api_sec,
+                                           self.__recv_window, self.RETRY_COUNT, self.__session)
+        self.__ws_base_url = args["websockets_base_url"]
         self.__ws_url = "wss://{1}/stream?streams=LISTENKEY/{0}@depth@100ms/{0}@markPrice@1s".format(
             self.symbol.lower(), args["websockets_base_url"])
 
-    def get_websockets_handler(self, orderbook, order_reports, order_lock, reports_lock, balance_list, balance_lock):
+    def get_websockets_handler(self, orderbook, order_reports, order_lock, reports_lock, balance_list, balance_lock,
+                               fixed_point: FixedPoint = None, max_depth: int = None,
+                               multiplexed: bool = False):
+        stream_manager = None
+        if multiplexed:
+            stream_manager = BinanceStreamManager.get_instance(self.__ws_base_url, self.__base_url, self.__api_key)
         return self.__ws_controller(url=self.__ws_url, exchange="Binance", orderbook=orderbook,
                                     order_reports=order_reports,
                                     reports_lock=reports_lock,
                                     ticker=self.symbol, order_lock=order_lock, api_key=self.__api_key,
                                     api_sec=self.__api_sec, balance_list=balance_list, balance_lock=balance_lock,
-                                    http_url=self.__base_url)
+                                    http_url=self.__base_url, fixed_point=fixed_point,
+                                    max_depth=max_depth, stream_manager=stream_manager)
 
     def get_multiplier(self) -> Decimal:
-        exchange_info = requests.get("https://fapi.binance.com/fapi/v1/exchangeInfo").json()
-        for symbol in exchange_info['symbols']:
-            if symbol['symbol'] == self.symbol:
-                for exchange_filter in symbol["filters"]:
-                    if exchange_filter["filterType"] == "LOT_SIZE":
-                        return Decimal(exchange_filter["stepSize"])
+        symbol_info = SymbolsMetadata.get_instance("Binance").get(self.symbol)
+        if symbol_info is not None:
+            return symbol_info.step_size
 
     def get_balances(self) -> dict:
-        counter = 0
-        response = None
-        while counter < self.RETRY_COUNT:
-            try:
-                params = {
-                    "timestamp": int(time.time() * 1000),
-                    "recvWindow": self.__recv_window,
-                }
-                logging.debug(str(params))
-                string_for_sign = urlencode(params)
-                params['signature'] = hmac.new(bytes(self.__api_sec, "UTF-8"), bytes(string_for_sign, "UTF-8"),
-                                               hashlib.sha256).hexdigest()
-                response = requests.get(f"https://{self.__base_url}/fapi/v2/balance?" + urlencode(params),
-                                        headers={"X-MBX-APIKEY": self.__api_key})
-                break
-            except BaseException:
-                counter += 1
-        if response is None:
-            raise ConnectionError("Connection error to binance")
-
+        response = self.__rest.request("GET", "/fapi/v2/balance")
         if response.status_code != 200:
             print(response.text)
             raise ConnectionError(response.text)
         else:
-            response = response.json()
             logging.debug(response.text)
+            response = response.json()
             balances = {}
             for balance in response:
                 balances[balance["asset"]] = {
@@ -127,102 +115,47 @@ class Binance:
     def place_order(self, route: str, price: Decimal, amount: Decimal, order_type: str = LIMIT_ORDER,
                     time_in_force: str = GOOD_UNTIL_CANCEL, stop_price: Decimal = None,
                     close_position: bool = None, reduce_only: bool = False) -> Order:
-        counter = 0
-        response = None
-        while counter < self.RETRY_COUNT:
-            try:
-                params = {
-                    "symbol": self.symbol,
-                    "side": route,
-                    "type": order_type,
-                    "quantity": float(Decimal(amount)),
-                    "price": float(("%.17f" % Decimal(price)).rstrip('0').rstrip('.')),
-                    "newClientOrderId": str(uuid.uuid4()),
-                    "reduceOnly": reduce_only,
-                    "timestamp": int(time.time() * 1000),
-                    "recvWindow": self.__recv_window,
-                    "timeInForce": time_in_force
-                }
-                if stop_price is not None:
-                    params["stopPrice"] = Decimal(stop_price)
-                if close_position is not None:
-                    params["closePosition"] = Decimal(close_position)
-
-                if order_type == self.MARKET_ORDER:
-                    del params["price"]
-                    del params["timeInForce"]
-
-                logging.debug(str(params))
-                string_for_sign = urlencode(params)
-                params['signature'] = hmac.new(bytes(self.__api_sec, "UTF-8"), bytes(string_for_sign, "UTF-8"),
-                                               hashlib.sha256).hexdigest()
-                response = requests.post(f"https://{self.__base_url}/fapi/v1/order", data=params,
-                                         headers={"X-MBX-APIKEY": self.__api_key})
-                break
-            except BaseException:
-                counter += 1
-        if response is None:
-            raise ConnectionError("Connection error to binance")
-
+        # one client order id for all attempts, so a retried order can not be placed twice
+        params = {
+            "symbol": self.symbol,
+            "side": route,
+            "type": order_type,
+            "quantity": float(Decimal(amount)),
+            "price": float(("%.17f" % Decimal(price)).rstrip('0').rstrip('.')),
+            "newClientOrderId": str(uuid.uuid4()),
+            "reduceOnly": reduce_only,
+            "timeInForce": time_in_force
+        }
+        if stop_price is not None:
+            params["stopPrice"] = Decimal(stop_price)
+        if close_position is not None:
+            params["closePosition"] = Decimal(close_position)
+
+        if order_type == self.MARKET_ORDER:
+            del params["price"]
+            del params["timeInForce"]
+
+        response = self.__rest.request("POST", "/fapi/v1/order", params)
         if response.status_code != 200:
-            response = response.json()
-            if response["code"] == -5021:
+            if response.json()["code"] == -5021:
                 return Order(order_id="", client_order_id="", symbol=self.symbol, price=price, status="REJECTED")
             raise ConnectionError(response.text)
         else:
-            response = response.json()
             logging.debug(response.text)
+            response = response.json()
             return self.get_order_status(Order(order_id=response["orderId"], client_order_id=response["clientOrderId"],
                                                symbol=self.symbol, price=price, status=response["status"]))
 
     def get_order_status(self, order: Order) -> Order:
-        counter = 0
-        response = None
-        while counter < self.RETRY_COUNT:
-            try:
-                params = {
-                    "symbol": self.symbol,
-                    "orderId": order.order_id,
-                    "timestamp": int(time.time() * 1000),
-                    "recvWindow": self.__recv_window,
-                }
-
-                logging.debug(str(params))
-                string_for_sign = urlencode(params)
-                params['signature'] = hmac.new(bytes(self.__api_sec, "UTF-8"), bytes(string_for_sign, "UTF-8"),
-                                               hashlib.sha256).hexdigest()
-                response = requests.get(f"https://{self.__base_url}/fapi/v1/openOrder?" + urlencode(params),
-                                        headers={"X-MBX-APIKEY": self.__api_key})
-                break
-            except BaseException:
-                counter += 1
-        if response is None:
-            raise ConnectionError("Connection error to binance")
-
+        params = {
+            "symbol": self.symbol,
+            "orderId": order.order_id,
+        }
+        response = self.__rest.request("GET", "/fapi/v1/openOrder", params)
         if response.status_code != 200:
             if response.json()["msg"] == "Order does not exist.":
                 order_copy = copy.deepcopy(order)
-                order_info = None
-                counter_2 = 0
-                while counter_2 < self.RETRY_COUNT:
-                    try:
-                        params = {
-                            "symbol": self.symbol,
-                            "orderId": order.order_id,
-                            "timestamp": int(time.time() * 1000),
-                            "recvWindow": self.__recv_window,
-                        }
-                        logging.debug(str(params))
-                        string_for_sign = urlencode(params)
-                        params['signature'] = hmac.new(bytes(self.__api_sec, "UTF-8"), bytes(string_for_sign, "UTF-8"),
-                                                       hashlib.sha256).hexdigest()
-                        order_info = requests.get(f"https://{self.__base_url}/fapi/v1/order?" + urlencode(params),
-                                                  headers={"X-MBX-APIKEY": self.__api_key})
-                        break
-                    except BaseException:
-                        counter_2 += 1
-                if order_info is None:
-                    raise ConnectionError("Connection error to binance")
+                order_info = self.__rest.request("GET", "/fapi/v1/order", params)
                 if order_info.status_code != 200:
                     raise ConnectionError("\n".join([response.text, order_info.text]))
 
@@ -231,65 +164,27 @@ class Binance:
 
             raise ConnectionError(response.text)
         else:
-            response = response.json()
             logging.debug(response.text)
+            response = response.json()
             return Order(order_id=response["orderId"], client_order_id=response["clientOrderId"], symbol=self.symbol,
                          price=response["price"], status=response["status"])
 
     def get_order_info(self, order: Order) -> Order:
-        counter = 0
-        response = None
-        while counter < self.RETRY_COUNT:
-            try:
-                params = {
-                    "symbol": self.symbol,
-                    "orderId": order.order_id,
-                    "timestamp": int(time.time() * 1000),
-                    "recvWindow": self.__recv_window
-                }
-                logging.debug(str(params))
-                string_for_sign = urlencode(params)
-                params['signature'] = hmac.new(bytes(self.__api_sec, "UTF-8"), bytes(string_for_sign, "UTF-8"),
-                                               hashlib.sha256).hexdigest()
-                response = requests.get(f"https://{self.__base_url}/fapi/v1/userTrades?" + urlencode(params),
-                                        headers={"X-MBX-APIKEY": self.__api_key})
-                break
-            except BaseException:
-                counter += 1
-        if response is None:
-            raise ConnectionError("Connection error to binance")
-
+        params = {
+            "symbol": self.symbol,
+            "orderId": order.order_id,
+        }
+        response = self.__rest.request("GET", "/fapi/v1/userTrades", params)
         if response.status_code != 200:
             raise ConnectionError(response.text)
         else:
-            counter_2 = 0
-            order_info = None
-            while counter_2 < self.RETRY_COUNT:
-                try:
-                    params = {
-                        "symbol": self.symbol,
-                        "orderId": order.order_id,
-                        "timestamp": int(time.time() * 1000),
-                        "recvWindow": self.__recv_window,
-                    }
-
-                    logging.debug(str(params))
-                    string_for_sign = urlencode(params)
-                    params['signature'] = hmac.new(bytes(self.__api_sec, "UTF-8"), bytes(string_for_sign, "UTF-8"),
-                                                   hashlib.sha256).hexdigest()
-                    order_info = requests.get(f"https://{self.__base_url}/fapi/v1/order?" + urlencode(params),
-                                              headers={"X-MBX-APIKEY": self.__api_key})
-                    break
-                except BaseException:
-                    counter_2 += 1
-            if order_info is None:
-                raise ConnectionError("Connection error to binance")
+            order_info = self.__rest.request("GET", "/fapi/v1/order", params)
             if order_info.status_code != 200:
                 raise ConnectionError("\n".join([response.text, order_info.text]))
 
             order_time = order_info.json()["time"]
-            response = response.json()
             logging.debug(response.text)
+            response = response.json()
             fee = 0
             usdt_amount = 0
             qty = 0
@@ -310,35 +205,17 @@ class Binance:
                              order_time=datetime.datetime.fromtimestamp(int(order_time) / 1000))
 
     def get_trades(self, start_timestamp: str | int, end_timestamp: str | int) -> list[Trade]:
-        counter = 0
-        response = None
-        while counter < self.RETRY_COUNT:
-            try:
-                params = {
-                    "startTime": int(start_timestamp),
-                    "endTime": int(end_timestamp),
-                    "symbol": self.symbol,
-                    "timestamp": int(time.time() * 1000),
-                    "recvWindow": self.__recv_window
-                }
-
-                logging.debug(str(params))
-                string_for_sign = urlencode(params)
-                params['signature'] = hmac.new(bytes(self.__api_sec, "UTF-8"), bytes(string_for_sign, "UTF-8"),
-                                               hashlib.sha256).hexdigest()
-                response = requests.get(f"https://{self.__base_url}/fapi/v1/userTrades?" + urlencode(params),
-                                        headers={"X-MBX-APIKEY": self.__api_key})
-                break
-            except BaseException:
-                counter += 1
-        if response is None:
-            raise ConnectionError("Connection error to binance")
-
+        params = {
+            "startTime": int(start_timestamp),
+            "endTime": int(end_timestamp),
+            "symbol": self.symbol,
+        }
+        response = self.__rest.request("GET", "/fapi/v1/userTrades", params)
         if response.status_code != 200:
             raise ConnectionError(response.text)
         else:
-            response = response.json()
             logging.debug(response.text)
+            response = response.json()
             trades = []
             for trade in response:
                 trades.append(Trade(
@@ -351,33 +228,12 @@ class Binance:
             return trades
 
     def get_positions(self) -> list[Position]:
-        counter = 0
-        response = None
-        while counter < self.RETRY_COUNT:
-            try:
-                params = {
-                    "symbol": self.symbol,
-                    "timestamp": int(time.time() * 1000),
-                    "recvWindow": self.__recv_window
-                }
-
-                logging.debug(str(params))
-                string_for_sign = urlencode(params)
-                params['signature'] = hmac.new(bytes(self.__api_sec, "UTF-8"), bytes(string_for_sign, "UTF-8"),
-                                               hashlib.sha256).hexdigest()
-                response = requests.get(f"https://{self.__base_url}/fapi/v2/positionRisk?" + urlencode(params),
-                                        headers={"X-MBX-APIKEY": self.__api_key})
-                break
-            except BaseException:
-                counter += 1
-        if response is None:
-            raise ConnectionError("Connection error to binance")
-
+        response = self.__rest.request("GET", "/fapi/v2/positionRisk", {"symbol": self.symbol})
         if response.status_code != 200:
             raise ConnectionError(response.text)
         else:
-            response = response.json()
             logging.debug(response.text)
+            response = response.json()
             positions = []
             for position in response:
                 positions.append(Position(entry_price=position["entryPrice"],
@@ -391,31 +247,14 @@ class Binance:
             return positions
 
     def get_income_history(self, start_time: str | int = None, end_time: str | int = None) -> list[Income]:
-        counter = 0
-        response = None
-        while counter < self.RETRY_COUNT:
-            try:
-                params = {
-                    "symbol": self.symbol,
-                    "timestamp": int(time.time() * 1000),
-                    "recvWindow": self.__recv_window
-                }
-                if start_time is not None and end_time is not None:
-                    params["startTime"] = start_time
-                    params["endTime"] = end_time
-
-                logging.debug(str(params))
-                string_for_sign = urlencode(params)
-                params['signature'] = hmac.new(bytes(self.__api_sec, "UTF-8"), bytes(string_for_sign, "UTF-8"),
-                                               hashlib.sha256).hexdigest()
-                response = requests.get(f"https://{self.__base_url}/fapi/v1/income?" + urlencode(params),
-                                        headers={"X-MBX-APIKEY": self.__api_key})
-                break
-            except BaseException:
-                counter += 1
-        if response is None:
-            raise ConnectionError("Connection error to binance")
-
+        params = {
+            "symbol": self.symbol,
+        }
+        if start_time is not None and end_time is not None:
+            params["startTime"] = start_time
+            params["endTime"] = end_time
+
+        response = self.__rest.request("GET", "/fapi/v1/income", params)
         if response.status_code != 200:
             raise ConnectionError(response.text)
         else:
@@ -429,69 +268,23 @@ class Binance:
             return incoming
 
     def get_max_leverage_for_usdt_amount(self, usdt_amount: Decimal) -> tuple[Decimal, Decimal]:
-        counter = 0
-        response = None
-        while counter < self.RETRY_COUNT:
-            try:
-                params = {
-                    "symbol": self.symbol,
-                    "timestamp": int(time.time() * 1000),
-                    "recvWindow": self.__recv_window
-                }
-                logging.debug(str(params))
-                string_for_sign = urlencode(params)
-                params['signature'] = hmac.new(bytes(self.__api_sec, "UTF-8"), bytes(string_for_sign, "UTF-8"),
-                                               hashlib.sha256).hexdigest()
-                response = requests.get(f"https://{self.__base_url}/fapi/v1/leverageBracket?" + urlencode(params),
-                                        headers={"X-MBX-APIKEY": self.__api_key})
-                break
-            except BaseException:
-                counter += 1
-        if response is None:
-            raise ConnectionError("Connection error to binance")
-
-        if response.status_code != 200:
-            raise ConnectionError(response.text)
-        else:
-            response = response.json()
-            logging.debug(response.text)
-            for bracket in response[0]["brackets"]:
-                if usdt_amount * bracket["initialLeverage"] < bracket["notionalCap"]:
-                    return Decimal(bracket["initialLeverage"]), Decimal("1")
+        return LeverageBrackets.get_instance("Binance", {"api_key": self.__api_key, "api_sec": self.__api_sec}) \
+            .get_max_leverage(self.symbol, usdt_amount)
 
     def cancel_order(self, order: Order) -> bool:
-        counter = 0
-        response = None
-        while counter < self.RETRY_COUNT:
-            try:
-                params = {
-                    "symbol": self.symbol,
-                    "orderId": order.order_id,
-                    "timestamp": int(time.time() * 1000),
-                    "recvWindow": self.__recv_window
-                }
-
-                logging.debug(str(params))
-                string_for_sign = urlencode(params)
-                params['signature'] = hmac.new(bytes(self.__api_sec, "UTF-8"), bytes(string_for_sign, "UTF-8"),
-                                               hashlib.sha256).hexdigest()
-                response = requests.delete(f"https://{self.__base_url}/fapi/v1/order", data=params,
-                                           headers={"X-MBX-APIKEY": self.__api_key})
-                break
-            except BaseException:
-                counter += 1
-        if response is None:
-            raise ConnectionError("Connection error to binance")
-
+        params = {
+            "symbol": self.symbol,
+            "orderId": order.order_id,
+        }
+        response = self.__rest.request("DELETE", "/fapi/v1/order", params)
         if response.status_code != 200:
             raise ConnectionError(response.text)
         else:
-            response = response.json()
             logging.debug(response.text)
             return True
 
     def get_funding_rate(self) -> Decimal:
-        req = requests.get("https://fapi.binance.com/fapi/v1/premiumIndex?symbol=" + self.symbol)
+        req = self.__rest.limiter.get("https://fapi.binance.com/fapi/v1/premiumIndex?symbol=" + self.symbol)
         if req.status_code != 200:
             raise ConnectionError
         req_json = req.json()
@@ -506,32 +299,14 @@ class Binance:
         return funding
 
     def __set_leverage(self, leverage: int | str) -> bool:
-        counter = 0
-        response = None
-        while counter < self.RETRY_COUNT:
-            try:
-                params = {
-                    "leverage": leverage,
-                    "symbol": self.symbol,
-                    "timestamp": int(time.time() * 1000),
-                    "recvWindow": self.__recv_window
-                }
-                logging.debug(str(params))
-                string_for_sign = urlencode(params)
-                params['signature'] = hmac.new(bytes(self.__api_sec, "UTF-8"), bytes(string_for_sign, "UTF-8"),
-                                               hashlib.sha256).hexdigest()
-                response = requests.post(f"https://{self.__base_url}/fapi/v1/leverage", data=params,
-                                         headers={"X-MBX-APIKEY": self.__api_key})
-                break
-            except BaseException:
-                counter += 1
-        if response is None:
-            raise ConnectionError("Connection error to binance")
-
+        params = {
+            "leverage": leverage,
+            "symbol": self.symbol,
+        }
+        response = self.__rest.request("POST", "/fapi/v1/leverage", params)
         if response.status_code != 200:
             raise ConnectionError(response.text)
         else:
-            response = response.json()
             logging.debug(response.text)
             return True
 
@@ -543,31 +318,17 @@ class Binance:
             if secs < seconds - funding_time < secs + 60:
                 return True
 
+    def seconds_to_funding_timeout(self, secs: int, now: datetime.datetime = None) -> float:
+        """Seconds until funding_timeout(secs) turns true, zero when it already is."""
+        return seconds_to_funding_timeout(self.funding_times, secs, now)
+
     def set_margin_type_and_leverage(self, margin_type: str, leverage: int | str):
         self.__set_leverage(leverage)
-        counter = 0
-        response = None
-        while counter < self.RETRY_COUNT:
-            try:
-                params = {
-                    "marginType": margin_type,
-                    "symbol": self.symbol,
-                    "timestamp": int(time.time() * 1000),
-                    "recvWindow": self.__recv_window
-                }
-
-                logging.debug(str(params))
-                string_for_sign = urlencode(params)
-                params['signature'] = hmac.new(bytes(self.__api_sec, "UTF-8"), bytes(string_for_sign, "UTF-8"),
-                                               hashlib.sha256).hexdigest()
-                response = requests.post(f"https://{self.__base_url}/fapi/v1/marginType", data=params,
-                                         headers={"X-MBX-APIKEY": self.__api_key})
-                break
-            except BaseException:
-                counter += 1
-        if response is None:
-            raise ConnectionError("Connection error to binance")
-
+        params = {
+            "marginType": margin_type,
+            "symbol": self.symbol,
+        }
+        response = self.__rest.request("POST", "/fapi/v1/marginType", params)
         if response.status_code != 200:
             err = response.json()["msg"]
             if err == "No need to change margin type.":
@@ -575,7 +336,6 @@ class Binance:
             raise ConnectionError(response.text)
 
         else:
-            response = response.json()
             logging.debug(response.text)
             return True
 
@@ -0,0 +1,159 @@
+import hashlib
+import hmac
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlencode
+
+import requests
+
+from libs.http_sessions import HttpSessions
+from libs.rate_limiter import RateLimiter
+
+
+class SignedRequestEngine:
+    """
+    Builds, signs and sends private REST requests of one account.
+    Transport errors and RETRY_STATUSES are retried with jittered exponential backoff, or after the
+    Retry-After the exchange asked for, until RETRY_COUNT attempts or the call deadline is used up.
+    Other responses are returned as they are, the caller decides what an error status means.
+    Order creation is not idempotent, so it is only retried when the exchange surely didn't take it:
+    on 429 or when the connection was never made. A timeout or 5xx may hide a live order.
+    Every attempt waits for the rate limiter of the venue, order placement and cancels go ahead of the rest.
+    """
+    venue = ""
+    RETRY_COUNT = 3
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+    BACKOFF_BASE = 0.1
+    BACKOFF_MAX = 2
+    DEADLINE = 10
+    ORDER_CREATE_PATHS = set()
+
+    def __init__(self, base_url: str, api_key: str, api_sec: str, recv_window: int | str,
+                 retry_count: int = None, session: requests.Session = None):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.recv_window = recv_window
+        self.retry_count = retry_count if retry_count is not None else self.RETRY_COUNT
+        self.session = session if session is not None else HttpSessions.get_session(self.venue)
+        self.limiter = RateLimiter.get_instance(self.venue)
+        # keyed once, every signature starts from a copy of this state
+        self.hmac = hmac.new(bytes(api_sec, "UTF-8"), digestmod=hashlib.sha256)
+        self.calls = 0
+        self.attempts = 0
+        self.retried_calls = 0
+
+    def sign(self, payload: str) -> str:
+        signature = self.hmac.copy()
+        signature.update(bytes(payload, "UTF-8"))
+        return signature.hexdigest()
+
+    def send(self, method: str, path: str, params: dict, timeout: tuple) -> requests.Response:
+        raise NotImplementedError
+
+    def send_params(self, method: str, path: str, params: dict, headers: dict, timeout: tuple) -> requests.Response:
+        if method == "GET":
+            query = "?" + urlencode(params) if params else ""
+            return self.session.get(f"{self.base_url}{path}{query}", headers=headers, timeout=timeout)
+        return self.session.request(method, f"{self.base_url}{path}", data=params, headers=headers, timeout=timeout)
+
+    def request(self, method: str, path: str, params: dict = None, deadline: float = None) -> requests.Response:
+        """Send a signed request, the returned response has the number of attempts in response.attempts."""
+        params = params if params is not None else {}
+        deadline_at = time.monotonic() + (deadline if deadline is not None else self.DEADLINE)
+        idempotent = not (method == "POST" and path in self.ORDER_CREATE_PATHS)
+        attempt = 0
+        while True:
+            attempt += 1
+            response, error = None, None
+            if not self.limiter.acquire(method, path, params, timeout=max(0., deadline_at - time.monotonic())):
+                self.finish(None, attempt)
+                raise ConnectionError(f"{self.venue} {path} rate limit wait exceeded the call deadline")
+            try:
+                response = self.send(method, path, params, self.attempt_timeout(deadline_at))
+            except requests.RequestException as e:
+                error = e
+            if response is not None:
+                self.limiter.update(method, path, response.headers)
+            if response is not None and response.status_code not in self.RETRY_STATUSES:
+                return self.finish(response, attempt)
+
+            delay = self.retry_delay(response, attempt)
+            if attempt >= self.retry_count or time.monotonic() + delay >= deadline_at or \
+                    not (idempotent or self.not_sent(response, error)):
+                if response is not None:
+                    return self.finish(response, attempt)
+                self.finish(None, attempt)
+                raise ConnectionError(f"Connection error to {self.venue} {path} after {attempt} attempts: {error}")
+            logging.warning(f"{self.venue} {method} {path} attempt {attempt} failed with "
+                            f"{response.status_code if response is not None else error}, retry in {delay:.2f}s")
+            time.sleep(delay)
+
+    @staticmethod
+    def attempt_timeout(deadline_at: float) -> tuple:
+        # the session adapter keeps separate connect and read timeouts, only cap both by what is left of the call
+        remaining = max(0.1, deadline_at - time.monotonic())
+        return min(HttpSessions.CONNECT_TIMEOUT, remaining), min(HttpSessions.READ_TIMEOUT, remaining)
+
+    @staticmethod
+    def not_sent(response: requests.Response | None, error: Exception | None) -> bool:
+        if response is not None:
+            return response.status_code == 429
+        return isinstance(error, requests.ConnectTimeout)
+
+    def retry_delay(self, response: requests.Response | None, attempt: int) -> float:
+        if response is not None and "Retry-After" in response.headers:
+            retry_after = self.parse_retry_after(response.headers["Retry-After"])
+            if retry_after is not None:
+                return retry_after
+        return random.uniform(0, min(self.BACKOFF_MAX, self.BACKOFF_BASE * 2 ** (attempt - 1)))
+
+    @staticmethod
+    def parse_retry_after(value: str) -> float | None:
+        try:
+            return max(0., float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0., parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def finish(self, response: requests.Response | None, attempts: int) -> requests.Response | None:
+        self.calls += 1
+        self.attempts += attempts
+        if attempts > 1:
+            self.retried_calls += 1
+        if response is not None:
+            response.attempts = attempts
+        return response
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "attempts": self.attempts, "retried_calls": self.retried_calls}
+
+
+class BinanceRequestEngine(SignedRequestEngine):
+    venue = "Binance"
+    ORDER_CREATE_PATHS = {"/fapi/v1/order"}
+
+    def send(self, method: str, path: str, params: dict, timeout: tuple) -> requests.Response:
+        params = dict(params, timestamp=int(time.time() * 1000), recvWindow=self.recv_window)
+        logging.debug(str(params))
+        params["signature"] = self.sign(urlencode(params))
+        headers = {"X-MBX-APIKEY": self.api_key}
+        return self.send_params(method, path, params, headers, timeout)
+
+
+class ByBitRequestEngine(SignedRequestEngine):
+    venue = "ByBit"
+    ORDER_CREATE_PATHS = {"/contract/v3/private/order/create"}
+
+    def send(self, method: str, path: str, params: dict, timeout: tuple) -> requests.Response:
+        ts = str(int(time.time() * 1000))
+        logging.debug(str(params))
+        headers = {"X-BAPI-API-KEY": self.api_key,
+                   "X-BAPI-TIMESTAMP": ts,
+                   "X-BAPI-RECV-WINDOW": str(self.recv_window),
+                   "X-BAPI-SIGN": self.sign(ts + self.api_key + str(self.recv_window) + urlencode(params))}
+        return self.send_params(method, path, params, headers, timeout)
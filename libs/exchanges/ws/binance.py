@@ -1,28 +1,58 @@
-import json
 import logging
 import time
+from collections import deque
 from decimal import Decimal
-from json import loads
 from threading import Event, Thread, Lock
 
-import requests
-
 from libs.exchanges.ws.client import Client
+from libs.exchanges.ws.decoder import loads
+from libs.exchanges.ws.journal import Journal
+from libs.exchanges.ws.latency import LatencyMetrics
+from libs.exchanges.ws.stream_manager import StreamManager
+from libs.objects.BookSide import BookSide
+from libs.objects.BookSnapshot import BookSnapshot
+from libs.objects.FixedPoint import FixedPoint
+from libs.rate_limiter import RateLimiter
 
 
 class Binance(Client):
+    DEPTH_BUFFER_SIZE = 1000
+    SNAPSHOT_LIMITS = [5, 10, 20, 50, 100, 500, 1000]
+
     def __init__(self, url: str, exchange: str, orderbook: dict, order_reports: dict, ticker: str, order_lock: Lock,
-                 reports_lock: Lock, api_key: str, api_sec: str, balance_lock: Lock, balance_list: dict, http_url: str):
+                 reports_lock: Lock, api_key: str, api_sec: str, balance_lock: Lock, balance_list: dict, http_url: str,
+                 fixed_point: FixedPoint = None, max_depth: int = None, stream_manager: StreamManager = None):
         self.__http_url = http_url
+        self.__limiter = RateLimiter.get_instance("Binance")
+        self.stream_manager = stream_manager
+        self.fixed_point = fixed_point
+        self.max_depth = max_depth
         self.orderbook = orderbook
         self.order_lock = order_lock
         self.updates = 0
+        self.book_seq = 0
+        self.book_ready = Event()
+        self.book_listeners = ()
+        self.funding_collected = Event()
+        self.depth_latency = LatencyMetrics.get(f"{exchange} {ticker} depth")
+        self.funding_latency = LatencyMetrics.get(f"{exchange} {ticker} funding")
+        self.user_data_latency = LatencyMetrics.get(f"{exchange} user_data")
+        self.depth_buffer = deque(maxlen=self.DEPTH_BUFFER_SIZE)
+        self.pending_snapshot = None
+        self.snapshot_thread = None
+        self.sync_generation = 0
+        self.resyncs = 0
+        self.out_of_sync_since = time.time()
+        self.out_of_sync_secs = 0.
         self.last_update = orderbook
         self.ticker = ticker
         self.__api_key = api_key
         self.__api_sec = api_sec
-        self.__listen_key = self.create_listen_key()
-        self.periodically = self.call_repeatedly(30 * 60, self.update_listen_key, (self.__listen_key,))
+        self.__listen_key = ""
+        self.periodically = None
+        if stream_manager is None:
+            self.__listen_key = self.create_listen_key()
+            self.periodically = self.call_repeatedly(30 * 60, self.update_listen_key, (self.__listen_key,))
         self.order_reports = order_reports
         self.reports_lock = reports_lock
         self.balance_lock = balance_lock
@@ -36,7 +66,8 @@ class Binance(Client):
     def create_listen_key(self) -> str:
         if self.__api_key == "":
             return ""
-        key = requests.post(f"https://{self.__http_url}/fapi/v1/listenKey", headers={"X-MBX-APIKEY": self.__api_key})
+        key = self.__limiter.request("POST", f"https://{self.__http_url}/fapi/v1/listenKey",
+                                     headers={"X-MBX-APIKEY": self.__api_key})
         return key.json()["listenKey"]
 
     def update_listen_key(self, key: str) -> None:
@@ -45,106 +76,215 @@ class Binance(Client):
         params = {
             "listenKey": key,
         }
-        requests.put(f"https://{self.__http_url}/fapi/v1/listenKey", params=params,
-                     headers={"X-MBX-APIKEY": self.__api_key})
+        self.__limiter.request("PUT", f"https://{self.__http_url}/fapi/v1/listenKey", params=params,
+                               headers={"X-MBX-APIKEY": self.__api_key})
 
     def handle_execution_report(self, data: dict):
         with self.reports_lock:
             self.order_reports[data["c"]] = data["X"]
 
+    def start(self):
+        if self.stream_manager is None:
+            return super().start()
+        self.stream_manager.register(self)
+
+    def stop(self):
+        if self.stream_manager is None:
+            return super().stop()
+        self.stream_manager.unregister(self)
+
     def on_message(self, message):
+        received = time.time()
         data = loads(message)
         if data["stream"] == self.__listen_key:
-            open("binance_uds.txt", "a").write(json.dumps(data) + "\n")
-            logging.debug(f"{self.exchange} {data}")
-            with self.reports_lock:
-                if "user_data_stream" not in self.order_reports:
-                    self.order_reports["user_data_stream"] = [data["data"]]
-                else:
-                    self.order_reports["user_data_stream"].append(data["data"])
-                if "a" not in data["data"]:
-                    return
-                if data["data"]["a"]["m"] == "FUNDING_FEE":
-                    self.order_reports["funding_collected"] = True
-                if data["e"] == "MARGIN_CALL":
-                    self.order_reports["liquidated"] = True
+            Journal.get_instance("binance_uds").write(message)
+            user_data = self.handle_user_data(data)
+            self.user_data_latency.record(data["data"].get("E"), received, time.time())
+            if not user_data:
+                return
+        self.handle_message(data, received)
 
+    def handle_user_data(self, data: dict) -> bool:
+        logging.debug(f"{self.exchange} {data}")
+        with self.reports_lock:
+            if "user_data_stream" not in self.order_reports:
+                self.order_reports["user_data_stream"] = [data["data"]]
+            else:
+                self.order_reports["user_data_stream"].append(data["data"])
+            if "a" not in data["data"]:
+                return False
+            # the account stream is shared by every symbol, the positions list tells which ones were funded
+            if data["data"]["a"]["m"] == "FUNDING_FEE" and \
+                    any(position["s"] == self.ticker for position in data["data"]["a"].get("P", [])):
+                self.order_reports["funding_collected"] = True
+                self.funding_collected.set()
+            if data["data"]["e"] == "MARGIN_CALL":
+                self.order_reports["liquidated"] = True
+        return True
+
+    def handle_message(self, data: dict, received: float = None):
+        if received is None:
+            received = time.time()
         if data["data"]["e"] == "markPriceUpdate":
             with self.order_lock:
                 self.orderbook["funding_rate"] = Decimal(data["data"]["r"]) * 100
+            self.funding_latency.record(data["data"].get("E"), received, time.time())
 
         if data["data"]["e"] == "depthUpdate":
-            data = data["data"]
-            if 'lastUpdateId' not in self.orderbook:
-                for key, value in self.get_snapshot().items():
-                    self.orderbook[key] = value
-            last_update_id = self.orderbook['lastUpdateId']
-
-            if self.updates == 0:
-                if data['U'] <= last_update_id <= data['u']:
-                    self.updates = 1
-                    self.orderbook['lastUpdateId'] = data['u']
-                    self.process_updates(data)
-
-            elif data['pu'] == last_update_id:
+            self.handle_depth_update(data["data"])
+            self.depth_latency.record(data["data"].get("E"), received, time.time())
+
+    def handle_depth_update(self, data: dict):
+        if self.updates == 1:
+            if data['pu'] == self.orderbook['lastUpdateId']:
                 self.orderbook['lastUpdateId'] = data['u']
                 self.process_updates(data)
-            else:
-                self.updates = 0
+                if not (self.orderbook['bids'].depleted() or self.orderbook['asks'].depleted()):
+                    return
+                logging.warning(f"{self.exchange} {self.ticker} truncated book ran out of levels, resync")
+                self.resyncs += 1
+                self.reset_sync()
+                return
+            logging.warning(f"{self.exchange} {self.ticker} depth stream continuity is broken, resync")
+            self.resyncs += 1
+            self.reset_sync()
+
+        self.depth_buffer.append(data)
+        if self.pending_snapshot is None:
+            self.request_snapshot()
+        else:
+            self.apply_snapshot()
+
+    def request_snapshot(self):
+        if self.snapshot_thread is not None and self.snapshot_thread.is_alive():
+            return
+        self.snapshot_thread = Thread(target=self.fetch_snapshot, args=(self.sync_generation,), daemon=True)
+        self.snapshot_thread.start()
+
+    def fetch_snapshot(self, generation: int):
+        try:
+            snapshot = self.get_snapshot()
+        except Exception:
+            logging.exception(f"{self.exchange} {self.ticker} depth snapshot failed")
+            return
+        if generation == self.sync_generation:
+            self.pending_snapshot = snapshot
+
+    def apply_snapshot(self):
+        """Binance sync procedure: drop buffered events older than the snapshot, then the first one
+        must straddle lastUpdateId and the rest must chain by pu."""
+        snapshot = self.pending_snapshot
+        last_update_id = snapshot['lastUpdateId']
+        while self.depth_buffer and self.depth_buffer[0]['u'] < last_update_id:
+            self.depth_buffer.popleft()
+        if not self.depth_buffer:
+            return
+        if self.depth_buffer[0]['U'] > last_update_id:
+            # snapshot is older than the buffered stream, take a new one
+            self.pending_snapshot = None
+            self.request_snapshot()
+            return
+
+        self.pending_snapshot = None
+        with self.order_lock:
+            for key in ("bids", "asks", "lastUpdateId", "timestamp", "event_time"):
+                self.orderbook[key] = snapshot[key]
+        while self.depth_buffer:
+            data = self.depth_buffer.popleft()
+            if self.updates == 1 and data['pu'] != self.orderbook['lastUpdateId']:
+                self.resyncs += 1
+                self.reset_sync()
+                return
+            self.orderbook['lastUpdateId'] = data['u']
+            self.process_updates(data)
+            self.updates = 1
+
+        self.out_of_sync_secs += time.time() - self.out_of_sync_since
+        self.out_of_sync_since = None
+        self.book_ready.set()
+
+    def reset_sync(self):
+        self.updates = 0
+        self.book_ready.clear()
+        self.sync_generation += 1
+        self.pending_snapshot = None
+        self.depth_buffer.clear()
+        if self.out_of_sync_since is None:
+            self.out_of_sync_since = time.time()
+        with self.order_lock:
+            self.orderbook.pop('lastUpdateId', None)
+            self.orderbook.pop('snapshot', None)
+
+    def sync_stats(self) -> dict:
+        out_of_sync_secs = self.out_of_sync_secs
+        if self.out_of_sync_since is not None:
+            out_of_sync_secs += time.time() - self.out_of_sync_since
+        return {"resyncs": self.resyncs, "out_of_sync_secs": out_of_sync_secs, "synced": self.updates == 1}
 
     def process_updates(self, data):
         with self.order_lock:
             for update in data['b']:
-                fix = [Decimal(update[0]), Decimal(update[1])]
-                self.manage_orderbook('bids', fix)
+                self.manage_orderbook('bids', self.parse_level(update))
             for update in data['a']:
-                fix = [Decimal(update[0]), Decimal(update[1])]
-                self.manage_orderbook('asks', fix)
+                self.manage_orderbook('asks', self.parse_level(update))
             self.last_update['timestamp'] = int(time.time() * 1000)
+            self.last_update['event_time'] = data.get('E')
+            self.publish_snapshot()
+
+    def publish_snapshot(self):
+        self.book_seq += 1
+        self.orderbook["snapshot"] = BookSnapshot(self.book_seq, self.orderbook["timestamp"],
+                                                  self.orderbook["bids"].freeze(), self.orderbook["asks"].freeze(),
+                                                  self.fixed_point, self.orderbook.get("event_time"))
+        for listener in self.book_listeners:
+            listener()
+
+    def add_book_listener(self, listener):
+        """Call listener without arguments after every published order book version."""
+        # replaced rather than mutated, so the websocket thread iterates a stable tuple
+        self.book_listeners = self.book_listeners + (listener,)
+
+    def remove_book_listener(self, listener):
+        self.book_listeners = tuple(x for x in self.book_listeners if x != listener)
+
+    def parse_level(self, level: list) -> list:
+        if self.fixed_point is not None:
+            return self.fixed_point.parse_level(level)
+        return [Decimal(level[0]), Decimal(level[1])]
 
     def manage_orderbook(self, side, update):
-        price, qty = update
-
-        for x in range(0, len(self.orderbook[side])):
-            if price == self.orderbook[side][x][0]:
-                if qty == 0:
-                    del self.orderbook[side][x]
-                    break
-                self.orderbook[side][x] = update
-                break
-            elif ((price > self.orderbook[side][x][0] and side == 'bids') or
-                  (price < self.orderbook[side][x][0] and side == 'asks')):
-                if qty != 0:
-                    self.orderbook[side].insert(x, update)
-                    break
-                break
+        self.orderbook[side].update(*update)
+
+    def snapshot_limit(self) -> int:
+        if self.max_depth is None:
+            return self.SNAPSHOT_LIMITS[-1]
+        capacity = self.max_depth * BookSide.RESERVE_FACTOR
+        return next((limit for limit in self.SNAPSHOT_LIMITS if limit >= capacity), self.SNAPSHOT_LIMITS[-1])
 
     def get_snapshot(self) -> dict:
-        r = requests.get(f'https://{self.__http_url}/fapi/v1/depth?symbol=' + self.ticker + '&limit=1000')
-        data = loads(r.content.decode())
-        data["bids"] = [[Decimal(x[0]), Decimal(x[1])] for x in data["bids"]]
-        data["asks"] = [[Decimal(x[0]), Decimal(x[1])] for x in data["asks"]]
+        limit = self.snapshot_limit()
+        r = self.__limiter.get(f'https://{self.__http_url}/fapi/v1/depth?symbol=' + self.ticker + f'&limit={limit}')
+        data = loads(r.content)
+        # a side that fills the whole limit is cut off by the exchange, levels below it are unknown
+        data["bids"] = BookSide(True, [self.parse_level(x) for x in data["bids"]], self.max_depth,
+                                len(data["bids"]) >= limit)
+        data["asks"] = BookSide(False, [self.parse_level(x) for x in data["asks"]], self.max_depth,
+                                len(data["asks"]) >= limit)
         data["lastUpdateId"] = data["lastUpdateId"]
         data["timestamp"] = int(time.time() * 1000)
+        data["event_time"] = data.get("E")
         return data
 
-    @staticmethod
-    def call_repeatedly(interval, func, *args):
-        stopped = Event()
-
-        def loop():
-            while not stopped.wait(interval):
-                logging.debug("exec repeat")
-                func(*args)
-
-        Thread(target=loop).start()
-        return stopped.set
-
-    def on_close(self):
+    def reset_stream(self):
+        self.reset_sync()
+        self.funding_collected.clear()
         with self.order_lock:
             self.orderbook.clear()
         with self.reports_lock:
             self.order_reports.clear()
+
+    def on_close(self):
+        self.reset_stream()
         try:
             self.periodically()
         except:
@@ -152,10 +292,7 @@ class Binance(Client):
         super().on_close()
 
     def on_error(self, error):
-        with self.order_lock:
-            self.orderbook.clear()
-        with self.reports_lock:
-            self.order_reports.clear()
+        self.reset_stream()
         try:
             self.periodically()
         except:
@@ -163,10 +300,7 @@ class Binance(Client):
         super().on_error(error)
 
     def on_open(self):
-        with self.order_lock:
-            self.orderbook.clear()
-        with self.reports_lock:
-            self.order_reports.clear()
+        self.reset_stream()
         self.__listen_key = self.create_listen_key()
         self.periodically = self.call_repeatedly(20 * 60, self.update_listen_key, (self.__listen_key,))
         super().on_open()
@@ -0,0 +1,34 @@
+import logging
+
+from libs.exchanges.ws.client import Client
+from libs.exchanges.ws.decoder import loads
+from libs.objects.FundingTable import FundingTable
+
+
+class BinanceFundingFeed(Client):
+    URL = "wss://fstream.binance.com/ws/!markPrice@arr@1s"
+
+    def __init__(self, tickers: list[str] = None, funding_table: FundingTable = None, url: str = URL):
+        # the mark price stream carries every symbol, tickers is accepted for a common feed signature
+        self.tickers = None
+        self.funding_table = funding_table if funding_table is not None else FundingTable("Binance")
+        super().__init__(url, "Binance")
+
+    def on_message(self, message):
+        data = loads(message)
+        if not isinstance(data, list):
+            return
+        for update in data:
+            if update.get("e") != "markPriceUpdate":
+                continue
+            self.funding_table.update(update["s"], funding_rate=update["r"], next_funding_time=update["T"],
+                                      mark_price=update["p"])
+
+    def on_close(self):
+        self.funding_table.clear()
+        super().on_close()
+
+    def on_error(self, error):
+        logging.error(f"{self.exchange} funding feed error {error}")
+        self.funding_table.clear()
+        super().on_error(error)
@@ -0,0 +1,95 @@
+import logging
+import time
+
+from libs.exchanges.ws.decoder import loads
+from libs.exchanges.ws.journal import Journal
+from libs.exchanges.ws.latency import LatencyMetrics
+from libs.exchanges.ws.stream_manager import StreamManager
+from libs.rate_limiter import RateLimiter
+
+
+class BinanceStreamManager(StreamManager):
+    """Combined stream carrying depth and mark price of up to MAX_SYMBOLS symbols plus the account user-data stream."""
+    # Binance allows 200 streams per connection, every symbol takes two
+    MAX_SYMBOLS = 100
+    TOPICS_PER_REQUEST = 50
+    LISTEN_KEY_INTERVAL = 20 * 60
+
+    def __init__(self, ws_base_url: str, http_url: str, api_key: str):
+        self.ws_base_url = ws_base_url
+        self.http_url = http_url
+        self.api_key = api_key
+        self.limiter = RateLimiter.get_instance("Binance")
+        self.listen_key = self.create_listen_key()
+        self.stop_listen_key = None
+        super().__init__(self.stream_url(), "Binance")
+        self.user_data_latency = LatencyMetrics.get(f"{self.exchange} user_data")
+
+    def stream_url(self) -> str:
+        if self.listen_key == "":
+            return f"wss://{self.ws_base_url}/stream"
+        return f"wss://{self.ws_base_url}/stream?streams={self.listen_key}"
+
+    def create_listen_key(self) -> str:
+        if self.api_key == "":
+            return ""
+        key = self.limiter.request("POST", f"https://{self.http_url}/fapi/v1/listenKey",
+                                   headers={"X-MBX-APIKEY": self.api_key})
+        return key.json()["listenKey"]
+
+    def update_listen_key(self):
+        if self.api_key == "":
+            return None
+        self.limiter.request("PUT", f"https://{self.http_url}/fapi/v1/listenKey", params={"listenKey": self.listen_key},
+                             headers={"X-MBX-APIKEY": self.api_key})
+
+    @staticmethod
+    def streams(ticker: str) -> list[str]:
+        return [f"{ticker.lower()}@depth@100ms", f"{ticker.lower()}@markPrice@1s"]
+
+    def subscribe(self, tickers: list[str]):
+        self.send_streams("SUBSCRIBE", tickers)
+
+    def unsubscribe(self, tickers: list[str]):
+        self.send_streams("UNSUBSCRIBE", tickers)
+
+    def send_streams(self, method: str, tickers: list[str]):
+        streams = [stream for ticker in tickers for stream in self.streams(ticker)]
+        for idx in range(0, len(streams), self.TOPICS_PER_REQUEST):
+            self.send({"method": method, "params": streams[idx:idx + self.TOPICS_PER_REQUEST],
+                       "id": self.next_request_id()})
+
+    def on_message(self, message):
+        received = time.time()
+        data = loads(message)
+        if "stream" not in data:
+            return
+        if data["stream"] == self.listen_key:
+            Journal.get_instance("binance_uds").write(message)
+            for handler in self.get_handlers():
+                try:
+                    handler.handle_user_data(data)
+                except Exception:
+                    logging.exception(f"{self.exchange} {handler.ticker} user data handling failed")
+            self.user_data_latency.record(data["data"].get("E"), received, time.time())
+            return
+        handler = self.get_handler(data["stream"].split("@", 1)[0].upper())
+        if handler is not None:
+            handler.handle_message(data, received)
+
+    def on_open(self):
+        if self.listen_key != "":
+            self.stop_listen_key = self.call_repeatedly(self.LISTEN_KEY_INTERVAL, self.update_listen_key)
+        super().on_open()
+
+    def disconnected(self):
+        if self.stop_listen_key is not None:
+            self.stop_listen_key()
+            self.stop_listen_key = None
+        super().disconnected()
+        if self.listen_key != "" and not self.stopped.is_set():
+            try:
+                self.listen_key = self.create_listen_key()
+                self.ws.url = self.stream_url()
+            except Exception:
+                logging.exception(f"{self.exchange} listen key renewal failed")
@@ -0,0 +1,58 @@
+
+from libs.exchanges.ws.client import Client
+from libs.exchanges.ws.decoder import dumps, loads
+from libs.objects.FundingTable import FundingTable
+from libs.symbols_metadata import SymbolsMetadata
+
+
+class ByBitFundingFeed(Client):
+    URL = "wss://stream.bybit.com/contract/usdt/public/v3"
+    TOPICS_PER_REQUEST = 10
+
+    def __init__(self, tickers: list[str] = None, funding_table: FundingTable = None, url: str = URL):
+        # tickers are pushed only when they change, a symbol that is not trading would never show up
+        self.tickers = self.trading_symbols(tickers)
+        self.funding_table = funding_table if funding_table is not None else FundingTable("ByBit")
+        self.stop_ping = None
+        super().__init__(url, "ByBit")
+
+    def on_message(self, message):
+        data = loads(message)
+        if "topic" not in data or not data["topic"].startswith("tickers."):
+            return
+        update = data["data"]
+        self.funding_table.update(update["symbol"], funding_rate=update.get("fundingRate"),
+                                  next_funding_time=update.get("nextFundingTime"),
+                                  mark_price=update.get("markPrice"))
+
+    @staticmethod
+    def trading_symbols(tickers: list[str] = None) -> list[str]:
+        metadata = SymbolsMetadata.get_instance("ByBit")
+        trading = metadata.get_symbols(status="Trading")
+        if tickers is None:
+            return trading
+        trading = set(trading)
+        return [ticker for ticker in tickers if ticker in trading]
+
+    def on_close(self):
+        if self.stop_ping is not None:
+            self.stop_ping()
+        self.funding_table.clear()
+        super().on_close()
+
+    def on_error(self, error):
+        if self.stop_ping is not None:
+            self.stop_ping()
+        self.funding_table.clear()
+        super().on_error(error)
+
+    def on_open(self):
+        for idx in range(0, len(self.tickers), self.TOPICS_PER_REQUEST):
+            self.ws.send(dumps(
+                {
+                    "op": "subscribe",
+                    "args": [f"tickers.{ticker}" for ticker in self.tickers[idx:idx + self.TOPICS_PER_REQUEST]],
+                    "req_id": f"fundingsub{idx}"
+                }))
+        self.stop_ping = self.call_repeatedly(20, lambda: self.ws.send('{"req_id": "100001", "op": "ping"}'))
+        super().on_open()
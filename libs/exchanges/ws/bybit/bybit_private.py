@@ -1,20 +1,26 @@
 import hashlib
 import hmac
-import json
 import time
-from json import loads
-from threading import Event, Thread, Lock
+from threading import Event, Lock
 
 from libs.exchanges.ws.client import Client
+from libs.exchanges.ws.decoder import dumps, loads
+from libs.exchanges.ws.journal import Journal
+from libs.exchanges.ws.latency import LatencyMetrics
+from libs.exchanges.ws.stream_manager import StreamManager
 
 
 class ByBitPrivate(Client):
     def __init__(self, url: str, exchange: str, orderbook: dict, order_reports: dict, ticker: str, order_lock: Lock,
-                 reports_lock: Lock, api_key: str, api_sec: str, balance_lock: Lock, balance_list: dict, http_url: str):
+                 reports_lock: Lock, api_key: str, api_sec: str, balance_lock: Lock, balance_list: dict, http_url: str,
+                 stream_manager: StreamManager = None):
         self.__http_url = http_url
+        self.stream_manager = stream_manager
         self.orderbook = orderbook
         self.order_lock = order_lock
         self.updates = 0
+        self.funding_collected = Event()
+        self.user_data_latency = LatencyMetrics.get(f"{exchange} user_data")
         self.last_update = orderbook
         self.ticker = ticker
         self.__api_key = api_key
@@ -30,77 +36,87 @@ class ByBitPrivate(Client):
         with self.reports_lock:
             self.order_reports[data["c"]] = data["X"]
 
+    def start(self):
+        if self.stream_manager is None:
+            return super().start()
+        self.stream_manager.register(self)
+
+    def stop(self):
+        if self.stream_manager is None:
+            return super().stop()
+        self.stream_manager.unregister(self)
+
     def on_message(self, message):
+        received = time.time()
+        Journal.get_instance("bybit_uds").write(message)
         data = loads(message)
-        open("bybit_uds.txt", "a").write(json.dumps(data) + "\n")
+        self.handle_message(data)
+        self.user_data_latency.record(data.get("creationTime"), received, time.time())
+
+    def handle_message(self, data: dict):
         if "topic" not in data:
             return
 
         if data["topic"] == "user.execution.contractAccount":
             if len(data) > 0:
                 if "execType" in data["data"][0]:
-                    if data["data"][0]["execType"] == "Funding":
+                    # the account stream is shared by every symbol
+                    if any(execution.get("execType") == "Funding" and execution.get("symbol") == self.ticker
+                           for execution in data["data"]):
                         with self.reports_lock:
                             self.order_reports["funding_collected"] = True
+                        self.funding_collected.set()
                     if data["data"][0]["execType"] == "BustTrade":
                         with self.reports_lock:
                             self.order_reports["liquidated"] = True
 
-    @staticmethod
-    def call_repeatedly(interval, func, *args):
-        stopped = Event()
-
-        def loop():
-            while not stopped.wait(interval):
-                func(*args)
-
-        Thread(target=loop).start()
-        return stopped.set
-
-    def on_close(self):
+    def reset_stream(self):
+        self.funding_collected.clear()
         with self.order_lock:
             self.orderbook.clear()
         with self.reports_lock:
             self.order_reports.clear()
+
+    def on_close(self):
+        self.reset_stream()
         super().on_close()
 
     def on_error(self, error):
-        with self.order_lock:
-            self.orderbook.clear()
-        with self.reports_lock:
-            self.order_reports.clear()
+        self.reset_stream()
         super().on_error(error)
 
-    def on_open(self):
-        with self.order_lock:
-            self.orderbook.clear()
-        with self.reports_lock:
-            self.order_reports.clear()
+    @staticmethod
+    def auth_message(api_key: str, api_sec: str) -> dict:
         ts = int((time.time() * 1000) + 10000)
         sign = str(
-            hmac.new(bytes(self.__api_sec, "utf-8"), bytes(f"GET/realtime{ts}", "utf-8"), hashlib.sha256).hexdigest())
-        self.ws.send(json.dumps(
-            {
-                "op": "auth",
-                "args":
-                    [
-                        self.__api_key,
-                        ts,
-                        sign
-                    ]
-            }
-        ))
-        self.ws.send(json.dumps(
-            {
-                "op": "subscribe",
-                "args": [
-                    "user.wallet.contractAccount",
-                    "user.order.contractAccount",
-                    "user.execution.contractAccount",
-                    "user.position.contractAccount"
-                ],
-                "req_id": "udssub"
-            }))
+            hmac.new(bytes(api_sec, "utf-8"), bytes(f"GET/realtime{ts}", "utf-8"), hashlib.sha256).hexdigest())
+        return {
+            "op": "auth",
+            "args":
+                [
+                    api_key,
+                    ts,
+                    sign
+                ]
+        }
+
+    @staticmethod
+    def subscribe_message() -> dict:
+        return {
+            "op": "subscribe",
+            "args": [
+                "user.wallet.contractAccount",
+                "user.order.contractAccount",
+                "user.execution.contractAccount",
+                "user.position.contractAccount"
+            ],
+            "req_id": "udssub"
+        }
+
+    def on_open(self):
+        self.reset_stream()
+        self.ws.send(dumps(self.auth_message(self.__api_key, self.__api_sec)))
+        self.ws.send(dumps(self.subscribe_message()))
 
         self.call_repeatedly(20, lambda: self.ws.send('{"req_id": "100001", "op": "ping"}'))
         super().on_open()
@@ -1,19 +1,34 @@
-import json
+import logging
 import time
 from decimal import Decimal
-from json import loads
-from threading import Event, Thread, Lock
+from threading import Event, Lock
 
 from libs.exchanges.ws.client import Client
+from libs.exchanges.ws.decoder import dumps, loads
+from libs.exchanges.ws.latency import LatencyMetrics
+from libs.exchanges.ws.stream_manager import StreamManager
+from libs.objects.BookSide import BookSide
+from libs.objects.BookSnapshot import BookSnapshot
+from libs.objects.FixedPoint import FixedPoint
 
 
 class ByBitPublic(Client):
     def __init__(self, url: str, exchange: str, orderbook: dict, order_reports: dict, ticker: str, order_lock: Lock,
-                 reports_lock: Lock, api_key: str, api_sec: str, balance_lock: Lock, balance_list: dict, http_url: str):
+                 reports_lock: Lock, api_key: str, api_sec: str, balance_lock: Lock, balance_list: dict, http_url: str,
+                 fixed_point: FixedPoint = None, max_depth: int = None, stream_manager: StreamManager = None):
         self.__http_url = http_url
+        self.stream_manager = stream_manager
+        self.fixed_point = fixed_point
+        self.max_depth = max_depth
         self.orderbook = orderbook
         self.order_lock = order_lock
         self.updates = 0
+        self.book_seq = 0
+        self.book_ready = Event()
+        self.book_listeners = ()
+        self.resubscribing = False
+        self.depth_latency = LatencyMetrics.get(f"{exchange} {ticker} depth")
+        self.funding_latency = LatencyMetrics.get(f"{exchange} {ticker} funding")
         self.last_update = orderbook
         self.ticker = ticker
         self.__api_key = api_key
@@ -29,89 +44,114 @@ class ByBitPublic(Client):
         with self.reports_lock:
             self.order_reports[data["c"]] = data["X"]
 
+    def start(self):
+        if self.stream_manager is None:
+            return super().start()
+        self.stream_manager.register(self)
+
+    def stop(self):
+        if self.stream_manager is None:
+            return super().stop()
+        self.stream_manager.unregister(self)
+
     def on_message(self, message):
-        data = loads(message)
+        received = time.time()
+        self.handle_message(loads(message), received)
+
+    def handle_message(self, data: dict, received: float = None):
         if "topic" not in data:
             return
+        if received is None:
+            received = time.time()
 
         if data["topic"] == f"tickers.{self.ticker}":
             with self.order_lock:
-                self.orderbook["funding_rate"] = Decimal(data["data"]["fundingRate"])*100
+                self.orderbook["funding_rate"] = Decimal(data["data"]["fundingRate"]) * 100
+            self.funding_latency.record(data.get("ts"), received, time.time())
         if data["topic"] == f"orderbook.50.{self.ticker}":
             if data["type"] == "snapshot":
                 with self.order_lock:
-                    self.orderbook["bids"] = [[Decimal(update[0]), Decimal(update[1])] for update
-                                              in
-                                              data["data"]["b"]]
-                    self.orderbook["asks"] = [[Decimal(update[0]), Decimal(update[1])] for update
-                                              in
-                                              data["data"]["a"]]
+                    self.orderbook["bids"] = BookSide(True, [self.parse_level(update) for update in data["data"]["b"]],
+                                                      self.max_depth)
+                    self.orderbook["asks"] = BookSide(False, [self.parse_level(update) for update in data["data"]["a"]],
+                                                      self.max_depth)
                     self.orderbook["timestamp"] = int(time.time() * 1000)
+                    self.orderbook["event_time"] = data.get("ts")
+                    self.publish_snapshot()
+                self.resubscribing = False
+                self.book_ready.set()
             elif data["type"] == "delta":
-                self.process_updates(data["data"])
+                self.process_updates(data["data"], data.get("ts"))
+                if not self.resubscribing and (self.orderbook["bids"].depleted() or self.orderbook["asks"].depleted()):
+                    logging.warning(f"{self.exchange} {self.ticker} truncated book ran out of levels, resubscribe")
+                    self.resubscribe_depth()
+            self.depth_latency.record(data.get("ts"), received, time.time())
 
-    def process_updates(self, data):
+    def process_updates(self, data, event_time: int = None):
         with self.order_lock:
             for update in data['b']:
-                fix = [Decimal(update[0]), Decimal(update[1])]
-                self.manage_orderbook('bids', fix)
+                self.manage_orderbook('bids', self.parse_level(update))
             for update in data['a']:
-                fix = [Decimal(update[0]), Decimal(update[1])]
-                self.manage_orderbook('asks', fix)
+                self.manage_orderbook('asks', self.parse_level(update))
             self.last_update['timestamp'] = int(time.time() * 1000)
+            self.last_update['event_time'] = event_time
+            self.publish_snapshot()
+
+    def publish_snapshot(self):
+        self.book_seq += 1
+        self.orderbook["snapshot"] = BookSnapshot(self.book_seq, self.orderbook["timestamp"],
+                                                  self.orderbook["bids"].freeze(), self.orderbook["asks"].freeze(),
+                                                  self.fixed_point, self.orderbook.get("event_time"))
+        for listener in self.book_listeners:
+            listener()
+
+    def add_book_listener(self, listener):
+        """Call listener without arguments after every published order book version."""
+        # replaced rather than mutated, so the websocket thread iterates a stable tuple
+        self.book_listeners = self.book_listeners + (listener,)
+
+    def remove_book_listener(self, listener):
+        self.book_listeners = tuple(x for x in self.book_listeners if x != listener)
+
+    def resubscribe_depth(self):
+        """The exchange answers a new subscription with a full snapshot of the book."""
+        self.resubscribing = True
+        self.book_ready.clear()
+        if self.stream_manager is not None:
+            self.stream_manager.unsubscribe([self.ticker])
+            self.stream_manager.subscribe([self.ticker])
+            return
+        for op in ("unsubscribe", "subscribe"):
+            self.ws.send(dumps({"op": op, "args": [f"orderbook.50.{self.ticker}"], "req_id": "depthsub"}))
+
+    def parse_level(self, level: list) -> list:
+        if self.fixed_point is not None:
+            return self.fixed_point.parse_level(level)
+        return [Decimal(level[0]), Decimal(level[1])]
 
     def manage_orderbook(self, side, update):
-        price, qty = update
-        if len(self.orderbook[side]) == 0 and qty != 0:
-            self.orderbook[side].append(update)
-        for x in range(0, len(self.orderbook[side])):
-            if price == self.orderbook[side][x][0]:
-                if qty == 0:
-                    del self.orderbook[side][x]
-                    break
-                else:
-                    self.orderbook[side][x] = update
-                    break
-            elif ((price > self.orderbook[side][x][0] and side == 'bids') or
-                  (price < self.orderbook[side][x][0] and side == 'asks')):
-                if qty != 0:
-                    self.orderbook[side].insert(x, update)
-                    break
-                else:
-                    break
-
-    @staticmethod
-    def call_repeatedly(interval, func, *args):
-        stopped = Event()
-
-        def loop():
-            while not stopped.wait(interval):
-                func(*args)
-
-        Thread(target=loop).start()
-        return stopped.set
+        self.orderbook[side].update(*update)
 
-    def on_close(self):
+    def reset_stream(self):
+        self.book_ready.clear()
+        self.resubscribing = False
         with self.order_lock:
             self.orderbook.clear()
         with self.reports_lock:
             self.order_reports.clear()
+
+    def on_close(self):
+        self.reset_stream()
         super().on_close()
 
     def on_error(self, error):
-        with self.order_lock:
-            self.orderbook.clear()
-        with self.reports_lock:
-            self.order_reports.clear()
+        self.reset_stream()
         super().on_error(error)
 
     def on_open(self):
-        with self.order_lock:
-            self.orderbook.clear()
-        with self.reports_lock:
-            self.order_reports.clear()
+        self.reset_stream()
 
-        self.ws.send(json.dumps(
+        self.ws.send(dumps(
             {
                 "op": "subscribe",
                 "args": [
@@ -119,7 +159,7 @@ class ByBitPublic(Client):
                 ],
                 "req_id": "depthsub"
             }))
-        self.ws.send(json.dumps(
+        self.ws.send(dumps(
             {
                 "op": "subscribe",
                 "args": [
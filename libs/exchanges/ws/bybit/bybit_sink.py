@@ -1,23 +1,51 @@
 from libs.exchanges.ws.bybit.bybit_private import ByBitPrivate
 from libs.exchanges.ws.bybit.bybit_public import ByBitPublic
-from threading import Lock
+from libs.exchanges.ws.bybit.bybit_stream import ByBitPrivateStreamManager, ByBitPublicStreamManager
+from threading import Event, Lock
+
+from libs.objects.FixedPoint import FixedPoint
 
 
 class ByBit:
     daemon = True
 
     def __init__(self, url: str, exchange: str, orderbook: dict, order_reports: dict, ticker: str, order_lock: Lock,
-                 reports_lock: Lock, api_key: str, api_sec: str, balance_lock: Lock, balance_list: dict, http_url: str):
+                 reports_lock: Lock, api_key: str, api_sec: str, balance_lock: Lock, balance_list: dict, http_url: str,
+                 fixed_point: FixedPoint = None, max_depth: int = None, multiplexed: bool = False):
+        public_manager, private_manager = None, None
+        if multiplexed:
+            public_manager = ByBitPublicStreamManager.get_instance(url + "/contract/usdt/public/v3")
+            private_manager = ByBitPrivateStreamManager.get_instance(url + "/contract/private/v3", api_key, api_sec)
         self.bybit_depth = ByBitPublic(url + "/contract/usdt/public/v3", exchange, orderbook, order_reports, ticker,
-                                       order_lock, reports_lock, api_key, api_sec, balance_lock, balance_list, http_url)
+                                       order_lock, reports_lock, api_key, api_sec, balance_lock, balance_list, http_url,
+                                       fixed_point, max_depth, public_manager)
         self.bybit_depth.daemon = self.daemon
         self.bybit_private_and_funding_rate = ByBitPrivate(url + "/contract/private/v3", exchange + "Private",
                                                            orderbook, order_reports, ticker, order_lock, reports_lock,
-                                                           api_key, api_sec, balance_lock, balance_list, http_url)
+                                                           api_key, api_sec, balance_lock, balance_list, http_url,
+                                                           private_manager)
         self.bybit_private_and_funding_rate.daemon = self.daemon
 
+    @property
+    def book_ready(self) -> Event:
+        return self.bybit_depth.book_ready
+
+    @property
+    def funding_collected(self) -> Event:
+        return self.bybit_private_and_funding_rate.funding_collected
+
+    def add_book_listener(self, listener):
+        self.bybit_depth.add_book_listener(listener)
+
+    def remove_book_listener(self, listener):
+        self.bybit_depth.remove_book_listener(listener)
+
     def start(self):
         self.bybit_depth.daemon = self.daemon
         self.bybit_private_and_funding_rate.daemon = self.daemon
         self.bybit_depth.start()
         self.bybit_private_and_funding_rate.start()
+
+    def stop(self):
+        self.bybit_depth.stop()
+        self.bybit_private_and_funding_rate.stop()
@@ -0,0 +1,76 @@
+import logging
+import time
+
+from libs.exchanges.ws.bybit.bybit_private import ByBitPrivate
+from libs.exchanges.ws.decoder import loads
+from libs.exchanges.ws.journal import Journal
+from libs.exchanges.ws.latency import LatencyMetrics
+from libs.exchanges.ws.stream_manager import StreamManager
+
+
+class ByBitPublicStreamManager(StreamManager):
+    """Public linear stream carrying order book and ticker topics of up to MAX_SYMBOLS symbols."""
+    TOPICS_PER_REQUEST = 10
+    PING_INTERVAL = 20
+
+    def __init__(self, url: str):
+        super().__init__(url, "ByBit")
+
+    @staticmethod
+    def topics(ticker: str) -> list[str]:
+        return [f"orderbook.50.{ticker}", f"tickers.{ticker}"]
+
+    def subscribe(self, tickers: list[str]):
+        self.send_topics("subscribe", tickers)
+
+    def unsubscribe(self, tickers: list[str]):
+        self.send_topics("unsubscribe", tickers)
+
+    def send_topics(self, op: str, tickers: list[str]):
+        topics = [topic for ticker in tickers for topic in self.topics(ticker)]
+        for idx in range(0, len(topics), self.TOPICS_PER_REQUEST):
+            self.send({"op": op, "args": topics[idx:idx + self.TOPICS_PER_REQUEST],
+                       "req_id": f"{op}{self.next_request_id()}"})
+
+    def ping(self):
+        self.send({"req_id": "100001", "op": "ping"})
+
+    def on_message(self, message):
+        received = time.time()
+        data = loads(message)
+        if "topic" not in data:
+            return
+        handler = self.get_handler(data["topic"].rsplit(".", 1)[-1])
+        if handler is not None:
+            handler.handle_message(data, received)
+
+
+class ByBitPrivateStreamManager(StreamManager):
+    """Private stream of one account; its topics are account wide, so every handler gets every message."""
+    MAX_SYMBOLS = 1000
+    PING_INTERVAL = 20
+
+    def __init__(self, url: str, api_key: str, api_sec: str):
+        self.__api_key = api_key
+        self.__api_sec = api_sec
+        super().__init__(url, "ByBitPrivate")
+        self.user_data_latency = LatencyMetrics.get(f"{self.exchange} user_data")
+
+    def ping(self):
+        self.send({"req_id": "100001", "op": "ping"})
+
+    def on_message(self, message):
+        received = time.time()
+        Journal.get_instance("bybit_uds").write(message)
+        data = loads(message)
+        for handler in self.get_handlers():
+            try:
+                handler.handle_message(data)
+            except Exception:
+                logging.exception(f"{self.exchange} {handler.ticker} user data handling failed")
+        self.user_data_latency.record(data.get("creationTime"), received, time.time())
+
+    def on_open(self):
+        self.send(ByBitPrivate.auth_message(self.__api_key, self.__api_sec))
+        self.send(ByBitPrivate.subscribe_message())
+        super().on_open()
@@ -1,5 +1,6 @@
 import logging
 import threading
+from typing import Callable
 
 import websocket
 
@@ -16,9 +17,10 @@ class Client(threading.Thread):
             header=headers
         )
         self.exchange = exchange
+        self.stopped = threading.Event()
 
     def run(self):
-        while True:
+        while not self.stopped.is_set():
             try:
                 self.ws.run_forever()
             except KeyboardInterrupt:
@@ -26,6 +28,10 @@ class Client(threading.Thread):
             except BaseException as e:
                 print(e)
 
+    def stop(self):
+        self.stopped.set()
+        self.ws.close()
+
     def on_message(self, message):
         logging.debug(message)
         pass
@@ -42,4 +48,16 @@ class Client(threading.Thread):
     def query_ws_order_status(self):
         pass
 
+    @staticmethod
+    def call_repeatedly(interval: float, func: Callable, *args) -> Callable[[], None]:
+        """Call func every interval seconds on a daemon thread until the returned function is called."""
+        stopped = threading.Event()
+
+        def loop():
+            while not stopped.wait(interval):
+                func(*args)
+
+        threading.Thread(target=loop, daemon=True).start()
+        return stopped.set
+
 
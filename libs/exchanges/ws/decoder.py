@@ -0,0 +1,59 @@
+import json
+import logging
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class JsonDecoder:
+    name = "json"
+
+    @staticmethod
+    def loads(message: str | bytes):
+        return json.loads(message)
+
+    @staticmethod
+    def dumps(data) -> str:
+        return json.dumps(data)
+
+
+class OrjsonDecoder:
+    name = "orjson"
+
+    @staticmethod
+    def loads(message: str | bytes):
+        return orjson.loads(message)
+
+    @staticmethod
+    def dumps(data) -> str:
+        return orjson.dumps(data, default=str).decode()
+
+
+decoders = {JsonDecoder.name: JsonDecoder}
+if orjson is not None:
+    decoders[OrjsonDecoder.name] = OrjsonDecoder
+
+decoder = OrjsonDecoder if orjson is not None else JsonDecoder
+
+
+def set_decoder(name: str = None):
+    """Select the websocket message decoder, the fastest installed one when name is None."""
+    global decoder
+    if name is None:
+        decoder = OrjsonDecoder if orjson is not None else JsonDecoder
+    elif name in decoders:
+        decoder = decoders[name]
+    else:
+        logging.warning(f"JSON decoder {name} is not installed, using {decoder.name}")
+    return decoder
+
+
+def loads(message: str | bytes):
+    return decoder.loads(message)
+
+
+def dumps(data) -> str:
+    return decoder.dumps(data)
+
@@ -0,0 +1,174 @@
+import atexit
+import glob
+import gzip
+import logging
+import os
+import queue
+import time
+from threading import Lock, Thread
+
+from libs.exchanges.ws.decoder import loads
+
+
+class Journal(Thread):
+    """
+    Append-only log of raw websocket frames.
+    Receive threads only put frames into a bounded queue; a background thread writes them in batches
+    to segment files that are rotated by size and age, only the newest MAX_SEGMENTS are kept. When the
+    queue is full frames are dropped and counted instead of blocking the receive thread.
+    """
+    DIRECTORY = "journal"
+    SEGMENT_BYTES = 64 * 1024 * 1024
+    SEGMENT_SECS = 3600
+    MAX_SEGMENTS = 48
+    COMPRESS = False
+    QUEUE_SIZE = 10000
+    BATCH_SIZE = 500
+    FLUSH_SECS = 1
+
+    __instances = {}
+    __instances_lock = Lock()
+
+    def __init__(self, name: str, directory: str = None):
+        super().__init__(daemon=True)
+        self.name = name
+        self.directory = directory if directory is not None else self.DIRECTORY
+        self.queue = queue.Queue(maxsize=self.QUEUE_SIZE)
+        self.file = None
+        self.segment_bytes = 0
+        self.segment_started = 0.
+        self.segment_index = 0
+        self.written = 0
+        self.dropped = 0
+        self.reported_dropped = 0
+        self.closed = False
+
+    @classmethod
+    def get_instance(cls, name: str) -> "Journal":
+        with cls.__instances_lock:
+            if name not in cls.__instances:
+                journal = cls(name)
+                journal.start()
+                atexit.register(journal.close)
+                cls.__instances[name] = journal
+            return cls.__instances[name]
+
+    def write(self, frame: str | bytes):
+        if isinstance(frame, bytes):
+            frame = frame.decode()
+        try:
+            self.queue.put_nowait(f"{int(time.time() * 1000)}\t{frame}\n")
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(None)
+        self.join(self.FLUSH_SECS * 5)
+
+    def run(self):
+        os.makedirs(self.directory, exist_ok=True)
+        while True:
+            try:
+                batch = [self.queue.get(timeout=self.FLUSH_SECS)]
+            except queue.Empty:
+                self.rotate_if_needed()
+                self.report_dropped()
+                continue
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            try:
+                self.write_batch([line for line in batch if line is not None])
+            except Exception:
+                logging.exception(f"Journal {self.name} write failed, {len(batch)} frames lost")
+            self.report_dropped()
+            if stop:
+                if self.file is not None:
+                    self.file.close()
+                return
+
+    def write_batch(self, lines: list[str]):
+        if not lines:
+            return
+        self.rotate_if_needed()
+        if self.file is None:
+            self.open_segment()
+        data = "".join(lines)
+        self.file.write(data)
+        self.file.flush()
+        self.segment_bytes += len(data)
+        self.written += len(lines)
+
+    def report_dropped(self):
+        dropped = self.dropped
+        if dropped > self.reported_dropped:
+            logging.warning(f"Journal {self.name} queue is full, {dropped - self.reported_dropped} frames dropped")
+            self.reported_dropped = dropped
+
+    def rotate_if_needed(self):
+        if self.file is None:
+            return
+        if self.segment_bytes >= self.SEGMENT_BYTES or time.time() - self.segment_started >= self.SEGMENT_SECS:
+            self.file.close()
+            self.file = None
+
+    def open_segment(self):
+        self.prune_segments()
+        self.segment_index += 1
+        path = os.path.join(self.directory, f"{self.name}-{time.strftime('%Y%m%d-%H%M%S', time.gmtime())}-"
+                                            f"{self.segment_index:04d}.jsonl")
+        if self.COMPRESS:
+            self.file = gzip.open(path + ".gz", "at")
+        else:
+            self.file = open(path, "a")
+        self.segment_bytes = 0
+        self.segment_started = time.time()
+
+    def prune_segments(self):
+        """Delete the oldest segments so that the new one keeps MAX_SEGMENTS on disk."""
+        if self.MAX_SEGMENTS <= 0:
+            return
+        old_segments = Journal.segments(self.name, self.directory)
+        for path in old_segments[:max(0, len(old_segments) - self.MAX_SEGMENTS + 1)]:
+            try:
+                os.remove(path)
+            except OSError:
+                logging.exception(f"Journal {self.name} can't delete segment {path}")
+
+    def stats(self) -> dict:
+        return {"written": self.written, "dropped": self.dropped, "queued": self.queue.qsize()}
+
+    @staticmethod
+    def segments(name: str, directory: str = None) -> list[str]:
+        directory = directory if directory is not None else Journal.DIRECTORY
+        paths = glob.glob(os.path.join(directory, f"{name}-*.jsonl")) + \
+            glob.glob(os.path.join(directory, f"{name}-*.jsonl.gz"))
+        return sorted(paths, key=os.path.basename)
+
+    @staticmethod
+    def read(name: str, directory: str = None, since: int = None, until: int = None):
+        """Yield (receive timestamp in ms, decoded frame) of a journal in write order."""
+        for path in Journal.segments(name, directory):
+            opener = gzip.open if path.endswith(".gz") else open
+            with opener(path, "rt") as file:
+                for line in file:
+                    timestamp, _, frame = line.rstrip("\n").partition("\t")
+                    try:
+                        timestamp = int(timestamp)
+                    except ValueError:
+                        # a segment cut by a crash ends with a partial line
+                        continue
+                    if since is not None and timestamp < since:
+                        continue
+                    if until is not None and timestamp > until:
+                        return
+                    try:
+                        yield timestamp, loads(frame)
+                    except ValueError:
+                        continue
@@ -0,0 +1,89 @@
+import bisect
+from threading import Lock
+
+
+class LatencyHistogram:
+    """Latencies in milliseconds counted in logarithmic buckets 10% wide, from 10 us to about a minute."""
+    BUCKETS = [0.01 * 1.1 ** i for i in range(165)]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.max = 0.
+        self.lock = Lock()
+
+    def record(self, latency_ms: float):
+        idx = bisect.bisect_left(self.BUCKETS, latency_ms)
+        with self.lock:
+            self.counts[idx] += 1
+            self.count += 1
+            if latency_ms > self.max:
+                self.max = latency_ms
+
+    def percentile(self, q: float) -> float | None:
+        """Upper bound of the bucket holding the q-th percentile, the exact max for the last bucket."""
+        with self.lock:
+            counts, count, maximum = list(self.counts), self.count, self.max
+        if count == 0:
+            return None
+        rank = q / 100 * count
+        seen = 0
+        for idx, bucket_count in enumerate(counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return min(self.BUCKETS[idx], maximum) if idx < len(self.BUCKETS) else maximum
+        return maximum
+
+    def snapshot(self) -> dict:
+        return {"count": self.count, "p50": self.percentile(50), "p99": self.percentile(99), "max": self.max}
+
+    def reset(self):
+        with self.lock:
+            self.counts = [0] * (len(self.BUCKETS) + 1)
+            self.count = 0
+            self.max = 0.
+
+
+class StreamLatency:
+    """
+    feed: local receive time minus the exchange event time, so it includes the clock offset to the venue.
+    processing: from receiving the frame to the end of its handling, decoding included.
+    """
+
+    def __init__(self):
+        self.feed = LatencyHistogram()
+        self.processing = LatencyHistogram()
+
+    def record(self, event_time: int | None, received: float, processed: float):
+        if event_time is not None:
+            self.feed.record(received * 1000 - event_time)
+        self.processing.record((processed - received) * 1000)
+
+    def snapshot(self) -> dict:
+        return {"feed": self.feed.snapshot(), "processing": self.processing.snapshot()}
+
+
+class LatencyMetrics:
+    __streams = {}
+    __streams_lock = Lock()
+
+    @classmethod
+    def get(cls, stream: str) -> StreamLatency:
+        with cls.__streams_lock:
+            if stream not in cls.__streams:
+                cls.__streams[stream] = StreamLatency()
+            return cls.__streams[stream]
+
+    @classmethod
+    def snapshot(cls) -> dict[str, dict]:
+        with cls.__streams_lock:
+            streams = dict(cls.__streams)
+        return {stream: latency.snapshot() for stream, latency in sorted(streams.items())}
+
+    @classmethod
+    def reset(cls):
+        with cls.__streams_lock:
+            streams = list(cls.__streams.values())
+        for latency in streams:
+            latency.feed.reset()
+            latency.processing.reset()
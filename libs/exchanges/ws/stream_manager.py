@@ -0,0 +1,117 @@
+import logging
+from threading import Event, Lock
+
+from libs.exchanges.ws.client import Client
+from libs.exchanges.ws.decoder import dumps
+
+
+class StreamManager(Client):
+    """
+    One websocket shared by many per-symbol handlers.
+    Handlers are the usual websocket client objects created with a stream manager: they are not
+    started as threads, the manager subscribes their topics and passes them decoded messages.
+    """
+    MAX_SYMBOLS = 100
+    PING_INTERVAL = None
+
+    instances = {}
+    instances_lock = Lock()
+
+    def __init__(self, url: str, exchange: str):
+        self.handlers = {}
+        self.handlers_lock = Lock()
+        self.reserved = 0
+        self.connected = Event()
+        self.request_id = 0
+        self.stop_ping = None
+        super().__init__(url, exchange)
+        self.daemon = True
+
+    @classmethod
+    def get_instance(cls, *args) -> "StreamManager":
+        """Reserve a handler slot on a manager with free capacity, opening a new socket when all are full."""
+        with cls.instances_lock:
+            managers = cls.instances.setdefault((cls.__name__,) + args, [])
+            for manager in managers:
+                if manager.reserve():
+                    return manager
+            manager = cls(*args)
+            manager.reserve()
+            managers.append(manager)
+            manager.start()
+            return manager
+
+    def reserve(self) -> bool:
+        with self.handlers_lock:
+            if self.reserved >= self.MAX_SYMBOLS:
+                return False
+            self.reserved += 1
+            return True
+
+    def register(self, handler):
+        with self.handlers_lock:
+            self.handlers[handler.ticker] = handler
+        if self.connected.is_set():
+            self.subscribe([handler.ticker])
+
+    def unregister(self, handler):
+        with self.handlers_lock:
+            if self.handlers.get(handler.ticker) is not handler:
+                return
+            self.handlers.pop(handler.ticker)
+            self.reserved -= 1
+        handler.reset_stream()
+        if self.connected.is_set():
+            self.unsubscribe([handler.ticker])
+
+    def get_handlers(self) -> list:
+        with self.handlers_lock:
+            return list(self.handlers.values())
+
+    def get_handler(self, ticker: str):
+        return self.handlers.get(ticker)
+
+    def next_request_id(self) -> int:
+        self.request_id += 1
+        return self.request_id
+
+    def send(self, payload: dict):
+        try:
+            self.ws.send(dumps(payload))
+        except Exception as e:
+            logging.error(f"{self.exchange} stream manager send failed {e}")
+
+    def subscribe(self, tickers: list[str]):
+        pass
+
+    def unsubscribe(self, tickers: list[str]):
+        pass
+
+    def ping(self):
+        pass
+
+    def disconnected(self):
+        self.connected.clear()
+        if self.stop_ping is not None:
+            self.stop_ping()
+            self.stop_ping = None
+        for handler in self.get_handlers():
+            handler.reset_stream()
+
+    def on_open(self):
+        for handler in self.get_handlers():
+            handler.reset_stream()
+        self.connected.set()
+        self.subscribe([handler.ticker for handler in self.get_handlers()])
+        if self.PING_INTERVAL is not None:
+            self.stop_ping = self.call_repeatedly(self.PING_INTERVAL, self.ping)
+        super().on_open()
+
+    def on_close(self):
+        self.disconnected()
+        super().on_close()
+
+    def on_error(self, error):
+        logging.error(f"{self.exchange} stream manager error {error}")
+        self.disconnected()
+        super().on_error(error)
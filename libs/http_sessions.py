@@ -0,0 +1,52 @@
+from threading import Lock
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    def __init__(self, timeout: tuple[float, float], *args, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        if timeout is None:
+            timeout = self.timeout
+        return super().send(request, timeout=timeout, **kwargs)
+
+
+class HttpSessions:
+    """
+    One keep-alive requests session per venue, shared by every tradable, screener and websocket object,
+    so REST calls reuse open TLS connections instead of a new handshake per request.
+    """
+    # the bulk depth fetcher keeps 8 requests in flight, the rest is for orders and account queries
+    POOL_SIZE = 16
+    CONNECT_TIMEOUT = 3.05
+    READ_TIMEOUT = 10
+
+    __sessions = {}
+    __sessions_lock = Lock()
+
+    @classmethod
+    def get_session(cls, venue: str) -> requests.Session:
+        with cls.__sessions_lock:
+            if venue not in cls.__sessions:
+                cls.__sessions[venue] = cls.create_session()
+            return cls.__sessions[venue]
+
+    @classmethod
+    def create_session(cls) -> requests.Session:
+        session = requests.Session()
+        adapter = TimeoutHTTPAdapter((cls.CONNECT_TIMEOUT, cls.READ_TIMEOUT), pool_connections=4,
+                                     pool_maxsize=cls.POOL_SIZE)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    @classmethod
+    def close_all(cls):
+        with cls.__sessions_lock:
+            for session in cls.__sessions.values():
+                session.close()
+            cls.__sessions.clear()
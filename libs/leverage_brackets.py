@@ -0,0 +1,95 @@
+import bisect
+import time
+from decimal import Decimal
+from threading import Lock
+
+from libs.exchanges.request_engine import BinanceRequestEngine
+from libs.rate_limiter import RateLimiter
+from libs.symbols_metadata import SymbolsMetadata
+
+
+def load_binance_brackets(auth_data: dict) -> dict[str, list[tuple[Decimal, Decimal]]]:
+    rest = BinanceRequestEngine("https://" + auth_data.get("base_url", "fapi.binance.com"), auth_data["api_key"],
+                                auth_data["api_sec"], auth_data.get("recv_window", 59999))
+    req = rest.request("GET", "/fapi/v1/leverageBracket")
+    if req.status_code != 200:
+        raise ConnectionError(req.text)
+    brackets = {}
+    for symbol in req.json():
+        brackets[symbol["symbol"]] = sorted((Decimal(str(bracket["notionalCap"])),
+                                             Decimal(str(bracket["initialLeverage"])))
+                                            for bracket in symbol["brackets"])
+    return brackets
+
+
+def load_bybit_brackets(auth_data: dict = None) -> dict[str, list[tuple[Decimal, Decimal]]]:
+    req = RateLimiter.get_instance("ByBit").get(
+        "https://api.bybit.com/derivatives/v3/public/risk-limit/list?category=linear")
+    if req.status_code != 200:
+        raise ConnectionError(req.text)
+    brackets = {}
+    for risk_limit in req.json()["result"]["list"]:
+        brackets.setdefault(risk_limit["symbol"], []).append((Decimal(risk_limit["riskLimitValue"]),
+                                                              Decimal(risk_limit["maxLeverage"])))
+    for symbol in brackets:
+        brackets[symbol].sort()
+    return brackets
+
+
+class LeverageBrackets:
+    TTL = 3600
+
+    loaders = {
+        "Binance": load_binance_brackets,
+        "ByBit": load_bybit_brackets
+    }
+    __instances = {}
+    __instances_lock = Lock()
+
+    def __init__(self, exchange_name: str, auth_data: dict = None, ttl: int = TTL):
+        self.exchange_name = exchange_name
+        self.auth_data = auth_data
+        self.ttl = ttl
+        self.brackets = {}
+        self.updated_at = 0
+        self.lock = Lock()
+
+    @classmethod
+    def get_instance(cls, exchange_name: str, auth_data: dict = None) -> "LeverageBrackets":
+        with cls.__instances_lock:
+            if exchange_name not in cls.__instances:
+                cls.__instances[exchange_name] = cls(exchange_name, auth_data)
+            elif auth_data is not None and cls.__instances[exchange_name].auth_data is None:
+                cls.__instances[exchange_name].auth_data = auth_data
+            return cls.__instances[exchange_name]
+
+    def refresh(self, force: bool = False):
+        with self.lock:
+            if not force and self.updated_at + self.ttl >= time.time():
+                return
+            self.brackets = self.loaders[self.exchange_name](self.auth_data)
+            self.updated_at = time.time()
+
+    def get_max_leverage(self, symbol: str, usdt_amount: Decimal) -> tuple[Decimal, Decimal] | None:
+        """
+        Args:
+            symbol: exchange symbol
+            usdt_amount: margin of the position
+        Returns:
+            max leverage which keeps usdt_amount * leverage below the notional cap of its bracket and leverage step
+        """
+        self.refresh()
+        if symbol not in self.brackets:
+            raise ConnectionError(f"Unknown symbol {symbol} on {self.exchange_name}")
+        brackets = self.brackets[symbol]
+        # notional cap grows and leverage falls with every bracket, so the predicate is monotonic
+        idx = bisect.bisect_left(brackets, True, key=lambda bracket: usdt_amount * bracket[1] < bracket[0])
+        if idx == len(brackets):
+            return None
+        return brackets[idx][1], self.leverage_step(symbol)
+
+    def leverage_step(self, symbol: str) -> Decimal:
+        symbol_info = SymbolsMetadata.get_instance(self.exchange_name).get(symbol)
+        if symbol_info is None or symbol_info.leverage_step is None:
+            return Decimal("1")
+        return symbol_info.leverage_step
@@ -9,3 +9,18 @@ def runtime(some_function):
         return result
 
     return wrapper
+
+
+def seconds_to_funding_timeout(funding_times: list[int], secs: int, now: datetime.datetime = None) -> float:
+    """
+    Seconds until the UTC time is secs past the next funding time, zero when it already is.
+    funding_times are seconds after midnight UTC.
+    """
+    if now is None:
+        now = datetime.datetime.utcnow()
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    seconds = (now - midnight).total_seconds()
+    for funding_time in funding_times + [86400 + t for t in funding_times]:
+        if seconds < funding_time + secs + 60:
+            return max(0., funding_time + secs - seconds)
+    return 0.
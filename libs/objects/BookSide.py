@@ -0,0 +1,99 @@
+import json
+from bisect import bisect_left
+from decimal import Decimal
+
+
+class BookSide:
+    """
+    One side of an order book kept sorted from the best price.
+    Levels are [price, qty] pairs, prices are indexed in a parallel sorted key list,
+    so a level update is a binary search instead of a scan over the whole side.
+
+    With max_depth only the top max_depth levels are visible to readers. Up to
+    RESERVE_FACTOR * max_depth levels are stored so that levels deleted from the top are
+    refilled from the reserve; once anything is trimmed, updates beyond the stored tail
+    are ignored because the levels between the tail and them are unknown. When the price
+    moves far enough the reserve runs out, the side is depleted and has to be reloaded.
+    A truncated snapshot, one that filled the whole requested limit, sets the same boundary
+    at its last level, with or without max_depth.
+    """
+    RESERVE_FACTOR = 2
+
+    def __init__(self, descending: bool, levels: list = None, max_depth: int = None, truncated: bool = False):
+        self.descending = descending
+        self.max_depth = max_depth
+        self.capacity = max_depth * self.RESERVE_FACTOR if max_depth is not None else None
+        self.boundary = None
+        self.keys = []
+        self.levels = []
+        if levels is not None:
+            self.replace(levels, truncated)
+
+    def key(self, price: Decimal) -> Decimal:
+        return -price if self.descending else price
+
+    def replace(self, levels: list, truncated: bool = False):
+        levels = sorted((level for level in levels if level[1] != 0), key=lambda level: self.key(level[0]))
+        self.levels = [[level[0], level[1]] for level in levels]
+        self.keys = [self.key(level[0]) for level in self.levels]
+        self.boundary = self.keys[-1] if truncated and self.keys else None
+        self.trim()
+
+    def trim(self):
+        if self.capacity is None or len(self.keys) <= self.capacity:
+            return
+        del self.keys[self.capacity:]
+        del self.levels[self.capacity:]
+        self.boundary = self.keys[-1]
+
+    def update(self, price: Decimal, qty: Decimal):
+        key = self.key(price)
+        if self.boundary is not None and key > self.boundary:
+            return
+        idx = bisect_left(self.keys, key)
+        if idx < len(self.keys) and self.keys[idx] == key:
+            if qty == 0:
+                del self.keys[idx]
+                del self.levels[idx]
+            else:
+                self.levels[idx] = [price, qty]
+        elif qty != 0:
+            self.keys.insert(idx, key)
+            self.levels.insert(idx, [price, qty])
+            self.trim()
+
+    def depleted(self) -> bool:
+        """The side was trimmed and fewer than max_depth known levels, or none at all without max_depth, are left."""
+        return self.boundary is not None and len(self.levels) < (self.max_depth or 1)
+
+    def window(self) -> list:
+        return self.levels if self.max_depth is None else self.levels[:self.max_depth]
+
+    def freeze(self) -> tuple:
+        # levels are replaced, never mutated, so a shallow copy is an immutable view
+        return tuple(self.window())
+
+    def best(self) -> list | None:
+        return self.levels[0] if self.levels else None
+
+    def clear(self):
+        self.keys.clear()
+        self.levels.clear()
+        self.boundary = None
+
+    def __getitem__(self, item):
+        if self.max_depth is None:
+            return self.levels[item]
+        return self.window()[item]
+
+    def __len__(self):
+        return len(self.levels) if self.max_depth is None else min(len(self.levels), self.max_depth)
+
+    def __iter__(self):
+        return iter(self.window())
+
+    def __bool__(self):
+        return len(self.levels) > 0
+
+    def __repr__(self):
+        return json.dumps(self.window(), default=str)
@@ -0,0 +1,34 @@
+import json
+
+from libs.objects.FixedPoint import FixedPoint
+from libs.objects.OrderBook import OrderBook
+
+
+class BookSnapshot:
+    """
+    Immutable order book version published by a websocket client.
+    The writer replaces the whole snapshot with one reference assignment, so readers take
+    it without the order lock and compare seq with their last read to skip unchanged books.
+    """
+    __slots__ = ("seq", "timestamp", "event_time", "bids", "asks", "fixed_point", "_order_book")
+
+    def __init__(self, seq: int, timestamp: int, bids: tuple, asks: tuple, fixed_point: FixedPoint = None,
+                 event_time: int = None):
+        self.seq = seq
+        self.timestamp = timestamp
+        # exchange time of the last applied update, None when the venue does not send one
+        self.event_time = event_time
+        self.bids = bids
+        self.asks = asks
+        self.fixed_point = fixed_point
+        self._order_book = None
+
+    def order_book(self, symbol: str = "") -> OrderBook:
+        # built once per version, so the depth index is shared by every reader of this snapshot
+        if self._order_book is None:
+            self._order_book = OrderBook(symbol, self.bids, self.asks, self.timestamp, self.fixed_point)
+        return self._order_book
+
+    def __repr__(self):
+        return json.dumps({"seq": self.seq, "timestamp": self.timestamp, "event_time": self.event_time,
+                           "bids": self.bids[:5], "asks": self.asks[:5]}, default=str)
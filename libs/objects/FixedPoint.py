@@ -0,0 +1,58 @@
+from decimal import Decimal
+
+from libs.objects.SymbolInfo import SymbolInfo
+
+
+class FixedPoint:
+    """
+    Scaled integer representation of prices and quantities of one symbol.
+    Scales are powers of ten taken from the symbol tick and step size, so exchange strings
+    are converted without Decimal arithmetic and converted back only at the boundaries.
+    """
+
+    def __init__(self, price_decimals: int, qty_decimals: int):
+        self.price_decimals = price_decimals
+        self.qty_decimals = qty_decimals
+        self.price_scale = 10 ** price_decimals
+        self.qty_scale = 10 ** qty_decimals
+        self.notional_scale = self.price_scale * self.qty_scale
+
+    @classmethod
+    def from_symbol_info(cls, symbol_info: SymbolInfo) -> "FixedPoint":
+        return cls(cls.decimals(symbol_info.tick_size), cls.decimals(symbol_info.step_size))
+
+    @staticmethod
+    def decimals(step: Decimal) -> int:
+        return max(0, -Decimal(step).normalize().as_tuple().exponent)
+
+    @staticmethod
+    def to_int(value: str | Decimal, scale: int) -> int:
+        value = str(value)
+        # up to 15 significant digits a double keeps the scaled value exact after rounding
+        if len(value) <= 15:
+            return round(float(value) * scale)
+        return int((Decimal(value) * scale).to_integral_value())
+
+    def parse_price(self, value: str | Decimal) -> int:
+        return self.to_int(value, self.price_scale)
+
+    def parse_qty(self, value: str | Decimal) -> int:
+        return self.to_int(value, self.qty_scale)
+
+    def parse_level(self, level: list) -> list[int]:
+        return [self.to_int(level[0], self.price_scale), self.to_int(level[1], self.qty_scale)]
+
+    def price(self, value: int) -> Decimal:
+        return Decimal(value).scaleb(-self.price_decimals)
+
+    def qty(self, value: int) -> Decimal:
+        return Decimal(value).scaleb(-self.qty_decimals)
+
+    def notional(self, value: int) -> Decimal:
+        return Decimal(value).scaleb(-self.price_decimals - self.qty_decimals)
+
+    def to_decimal_levels(self, levels) -> list[list[Decimal]]:
+        return [[self.price(level[0]), self.qty(level[1])] for level in levels]
+
+    def __repr__(self):
+        return f"FixedPoint(price_decimals={self.price_decimals}, qty_decimals={self.qty_decimals})"
@@ -0,0 +1,58 @@
+import json
+import time
+from decimal import Decimal
+from threading import Lock
+from typing import Iterable
+
+
+class FundingTable:
+    def __init__(self, exchange: str):
+        self.exchange = exchange
+        self.rows = {}
+        self.updated_at = 0
+        self.lock = Lock()
+
+    def update(self, symbol: str, funding_rate: str | Decimal = None, next_funding_time: int = None,
+               mark_price: str | Decimal = None):
+        with self.lock:
+            row = self.rows.get(symbol)
+            if row is None:
+                row = self.rows[symbol] = {"funding_rate": None, "next_funding_time": None, "mark_price": None,
+                                           "updated_at": 0}
+            if funding_rate is not None:
+                row["funding_rate"] = funding_rate
+            if next_funding_time is not None:
+                row["next_funding_time"] = int(next_funding_time)
+            if mark_price is not None:
+                row["mark_price"] = mark_price
+            row["updated_at"] = self.updated_at = time.time()
+
+    def clear(self):
+        with self.lock:
+            self.rows.clear()
+            self.updated_at = 0
+
+    def is_fresh(self, max_age: float, symbols: Iterable[str] = None) -> bool:
+        """
+        The feed delivered something within max_age seconds and every symbol has a row.
+        Rows are only pushed on change and the table is cleared on disconnect, so a quiet symbol keeps its last value.
+        """
+        with self.lock:
+            if not self.rows or self.updated_at < time.time() - max_age:
+                return False
+            return symbols is None or all(symbol in self.rows for symbol in symbols)
+
+    def get(self, symbol: str) -> dict | None:
+        with self.lock:
+            row = self.rows.get(symbol)
+            return row.copy() if row is not None else None
+
+    def funding_rates(self) -> list[tuple[str, str | Decimal]]:
+        with self.lock:
+            return [(symbol, row["funding_rate"]) for symbol, row in self.rows.items()
+                    if row["funding_rate"] is not None]
+
+    def __repr__(self):
+        with self.lock:
+            return json.dumps({"exchange": self.exchange, "updated_at": self.updated_at, "rows": self.rows},
+                              default=str)
@@ -1,13 +1,25 @@
 import json
+from bisect import bisect_left
 from decimal import Decimal
+from itertools import accumulate
+from operator import mul
+from typing import Iterable
+
+from libs.objects.FixedPoint import FixedPoint
 
 
 class OrderBook:
-    def __init__(self, symbol: str, bids: list, asks: list, timestamp: int):
+    def __init__(self, symbol: str, bids: list, asks: list, timestamp: int, fixed_point: FixedPoint = None):
         self.bids = bids
         self.asks = asks
         self.symbol = symbol
         self.timestamp = timestamp
+        self.fixed_point = fixed_point
+        self.depth_indexes = {}
+
+    def price(self, side: str, depth: int = 0) -> Decimal:
+        price = (self.bids if side == "bids" else self.asks)[depth][0]
+        return self.fixed_point.price(price) if self.fixed_point is not None else price
 
     @staticmethod
     def calc_delta(num_1: Decimal, num_2: Decimal):
@@ -20,6 +32,23 @@ class OrderBook:
         """
         return (abs(num_1 - num_2) / ((num_1 + num_2) / 2)) * 100
 
+    def depth_index(self, route: str) -> tuple[list, list, list] | None:
+        """
+        Args:
+            route: Route for calculation. 'BUY' or 'SELL' only
+        Returns:
+            prices, cumulative quantities and cumulative notionals of the side the route takes liquidity from
+        """
+        if route not in ("BUY", "SELL"):
+            return None
+        if route not in self.depth_indexes:
+            levels = self.asks if route == "BUY" else self.bids
+            prices = [level[0] for level in levels]
+            quantities = [level[1] for level in levels]
+            self.depth_indexes[route] = (prices, list(accumulate(quantities)),
+                                         list(accumulate(map(mul, prices, quantities))))
+        return self.depth_indexes[route]
+
     def calculate(self, route: str, amount: Decimal = 0) -> (Decimal, Decimal, Decimal):
         """
         Args:
@@ -30,47 +59,21 @@ class OrderBook:
             avg_order_price: average order price
             usdt_amount: spent/received token in second part of ticker
         """
-        amount_orig = amount
-        if route == "BUY":
-            if amount > 0:
-                buy_price, avg_buy_price, usdt_amount, is_first = 0, 0, 0, True
-                for i in self.asks:
-                    if Decimal(i[1]) >= amount and is_first:
-                        return Decimal(i[0]), Decimal(i[0]), amount * Decimal(i[0])
-                    elif Decimal(i[1]) < amount and is_first:
-                        is_first = False
-                        usdt_amount += Decimal(i[1]) * Decimal(i[0])
-                        amount -= Decimal(i[1])
-                        continue
-                    if not is_first:
-                        if Decimal(i[1]) <= amount:
-                            usdt_amount += Decimal(i[1]) * Decimal(i[0])
-                            amount -= Decimal(i[1])
-                            if amount == 0:
-                                return Decimal(i[0]), usdt_amount / amount_orig, usdt_amount
-                        else:
-                            usdt_amount += amount * Decimal(i[0])
-                            return Decimal(i[0]), usdt_amount / amount_orig, usdt_amount
-        elif route == "SELL":
-            if amount > 0:
-                sell_price, avg_sell_price, usdt_amount, is_first = 0, 0, 0, True
-                for i in self.bids:
-                    if Decimal(i[1]) >= amount and is_first:
-                        return Decimal(i[0]), Decimal(i[0]), amount * Decimal(i[0])
-                    elif Decimal(i[1]) < amount and is_first:
-                        is_first = False
-                        usdt_amount += Decimal(i[1]) * Decimal(i[0])
-                        amount -= Decimal(i[1])
-                        continue
-                    if not is_first:
-                        if Decimal(i[1]) <= amount:
-                            usdt_amount += Decimal(i[1]) * Decimal(i[0])
-                            amount -= Decimal(i[1])
-                            if amount == 0:
-                                return Decimal(i[0]), usdt_amount / amount_orig, usdt_amount
-                        else:
-                            usdt_amount += amount * Decimal(i[0])
-                            return Decimal(i[0]), usdt_amount / amount_orig, usdt_amount
+        depth_index = self.depth_index(route)
+        if depth_index is None or amount <= 0:
+            return None
+        prices, cum_qty, cum_notional = depth_index
+        book_amount = self.fixed_point.parse_qty(amount) if self.fixed_point is not None else amount
+        idx = bisect_left(cum_qty, book_amount)
+        if idx == len(prices):
+            return None
+        price = self.fixed_point.price(prices[idx]) if self.fixed_point is not None else prices[idx]
+        if idx == 0:
+            return price, price, amount * price
+        usdt_amount = cum_notional[idx - 1] + (book_amount - cum_qty[idx - 1]) * prices[idx]
+        if self.fixed_point is not None:
+            usdt_amount = self.fixed_point.notional(usdt_amount)
+        return price, usdt_amount / amount, usdt_amount
 
     def calculate_for_usdt(self, route: str, amount: Decimal = 0):
         """
@@ -82,47 +85,33 @@ class OrderBook:
             avg_order_price: average order price
             first_amount: spent/received token in first part of ticker
         """
-        amount_orig = amount
-        if route == "BUY":
-            if amount > 0:
-                buy_price, avg_buy_price, usdt_amount, is_first = 0, 0, 0, True
-                for i in self.asks:
-                    if Decimal(i[1]) * Decimal(i[0]) >= amount and is_first:
-                        return Decimal(i[0]), Decimal(i[0]), amount / Decimal(i[0])
-                    elif Decimal(i[1]) * Decimal(i[0]) < amount and is_first:
-                        is_first = False
-                        usdt_amount += Decimal(i[1])
-                        amount -= Decimal(i[1]) * Decimal(i[0])
-                        continue
-                    if not is_first:
-                        if Decimal(i[1]) * Decimal(i[0]) <= amount:
-                            usdt_amount += Decimal(i[1])
-                            amount -= Decimal(i[1]) * Decimal(i[0])
-                            if amount == 0:
-                                return Decimal(i[0]), amount_orig / usdt_amount, usdt_amount
-                        else:
-                            usdt_amount += amount / Decimal(i[0])
-                            return Decimal(i[0]), amount_orig / usdt_amount, usdt_amount
-        elif route == "SELL":
-            if amount > 0:
-                sell_price, avg_sell_price, usdt_amount, is_first = 0, 0, 0, True
-                for i in self.bids:
-                    if Decimal(i[1]) * Decimal(i[0]) >= amount and is_first:
-                        return Decimal(i[0]), Decimal(i[0]), amount / Decimal(i[0])
-                    elif Decimal(i[1]) * Decimal(i[0]) < amount and is_first:
-                        is_first = False
-                        usdt_amount += Decimal(i[1])
-                        amount -= Decimal(i[1]) * Decimal(i[0])
-                        continue
-                    if not is_first:
-                        if Decimal(i[1]) * Decimal(i[0]) <= amount:
-                            usdt_amount += Decimal(i[1])
-                            amount -= Decimal(i[1]) * Decimal(i[0])
-                            if amount == 0:
-                                return Decimal(i[0]), amount_orig / usdt_amount, usdt_amount
-                        else:
-                            usdt_amount += amount / Decimal(i[0])
-                            return Decimal(i[0]), amount_orig / usdt_amount, usdt_amount
+        depth_index = self.depth_index(route)
+        if depth_index is None or amount <= 0:
+            return None
+        prices, cum_qty, cum_notional = depth_index
+        book_amount = amount
+        if self.fixed_point is not None:
+            book_amount = Decimal(amount).scaleb(self.fixed_point.price_decimals + self.fixed_point.qty_decimals)
+        idx = bisect_left(cum_notional, book_amount)
+        if idx == len(prices):
+            return None
+        price = self.fixed_point.price(prices[idx]) if self.fixed_point is not None else prices[idx]
+        if idx == 0:
+            return price, price, amount / price
+        filled_qty, filled_notional = cum_qty[idx - 1], cum_notional[idx - 1]
+        if self.fixed_point is not None:
+            filled_qty, filled_notional = self.fixed_point.qty(filled_qty), self.fixed_point.notional(filled_notional)
+        first_amount = filled_qty + (amount - filled_notional) / price
+        return price, amount / first_amount, first_amount
+
+    def calculate_batch(self, route: str, amounts: Iterable[Decimal]) -> list:
+        return [self.calculate(route, amount) for amount in amounts]
+
+    def calculate_for_usdt_batch(self, route: str, amounts: Iterable[Decimal]) -> list:
+        return [self.calculate_for_usdt(route, amount) for amount in amounts]
 
     def to_json(self):
-        return json.dumps({"bids": self.bids[:25], "asks": self.asks[:25], "timestamp": self.timestamp}, default=str)
+        bids, asks = self.bids[:25], self.asks[:25]
+        if self.fixed_point is not None:
+            bids, asks = self.fixed_point.to_decimal_levels(bids), self.fixed_point.to_decimal_levels(asks)
+        return json.dumps({"bids": bids, "asks": asks, "timestamp": self.timestamp}, default=str)
@@ -0,0 +1,41 @@
+import json
+from decimal import Decimal
+
+
+class SymbolInfo:
+    def __init__(self, symbol: str, status: str, contract_type: str, step_size: Decimal, tick_size: Decimal,
+                 min_qty: Decimal | None = None, min_notional: Decimal | None = None,
+                 max_leverage: Decimal | None = None, leverage_step: Decimal | None = None):
+        self.symbol = symbol
+        self.status = status
+        self.contract_type = contract_type
+        self.step_size = step_size
+        self.tick_size = tick_size
+        self.min_qty = min_qty
+        self.min_notional = min_notional
+        self.max_leverage = max_leverage
+        self.leverage_step = leverage_step
+
+    def to_dict(self) -> dict:
+        return {
+            "symbol": self.symbol,
+            "status": self.status,
+            "contract_type": self.contract_type,
+            "step_size": self.step_size,
+            "tick_size": self.tick_size,
+            "min_qty": self.min_qty,
+            "min_notional": self.min_notional,
+            "max_leverage": self.max_leverage,
+            "leverage_step": self.leverage_step
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SymbolInfo":
+        data = data.copy()
+        for key in ["step_size", "tick_size", "min_qty", "min_notional", "max_leverage", "leverage_step"]:
+            if data.get(key) is not None:
+                data[key] = Decimal(data[key])
+        return cls(**data)
+
+    def __repr__(self):
+        return json.dumps(self.to_dict(), default=str)
@@ -0,0 +1,260 @@
+import time
+from threading import Condition, Lock
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+
+from libs.http_sessions import HttpSessions
+
+
+class TokenBucket:
+    """
+    capacity tokens refilled evenly over window seconds.
+    A waiter lets every waiter of a higher priority go first, and only ORDER traffic may spend the
+    reserve, the last part of the bucket kept free for placing and cancelling orders.
+    """
+    ORDER = 0
+    ACCOUNT = 1
+    MARKET_DATA = 2
+
+    def __init__(self, capacity: int, window: float, reserve: float = 0.):
+        self.capacity = capacity
+        self.window = window
+        self.reserve = reserve
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.waiting = [0] * (self.MARKET_DATA + 1)
+        self.condition = Condition()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / self.window)
+        self.updated = now
+
+    def acquire(self, weight: int, priority: int = MARKET_DATA, timeout: float = None) -> bool:
+        """Block until weight tokens are taken, False if the timeout passed first."""
+        weight = min(weight, self.capacity)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self.condition:
+            self.waiting[priority] += 1
+            try:
+                while True:
+                    self.refill()
+                    floor = 0 if priority == self.ORDER else self.capacity * self.reserve
+                    if not any(self.waiting[:priority]) and self.tokens - weight >= floor:
+                        self.tokens -= weight
+                        return True
+                    wait_secs = max(0.001, (weight + floor - self.tokens) * self.window / self.capacity)
+                    if deadline is not None:
+                        if time.monotonic() >= deadline:
+                            return False
+                        wait_secs = min(wait_secs, deadline - time.monotonic())
+                    self.condition.wait(wait_secs)
+            finally:
+                self.waiting[priority] -= 1
+                self.condition.notify_all()
+
+    def release(self, weight: int):
+        """Give back tokens of a request that was not sent."""
+        with self.condition:
+            self.refill()
+            self.tokens = min(self.capacity, self.tokens + min(weight, self.capacity))
+            self.condition.notify_all()
+
+    def sync(self, used: int, capacity: int = None, reset_in: float = None):
+        """
+        Take the usage the exchange reported, it also counts requests this process didn't see.
+        An exhausted bucket stays empty until reset_in seconds pass, if the exchange told when it resets.
+        """
+        with self.condition:
+            if capacity:
+                self.capacity = capacity
+            self.refill()
+            self.tokens = min(self.tokens, self.capacity - used)
+            if self.tokens <= 0 and reset_in is not None:
+                self.tokens = min(self.tokens, -reset_in * self.capacity / self.window)
+
+    def available(self) -> float:
+        with self.condition:
+            self.refill()
+            return self.tokens
+
+
+class RateLimiter:
+    """
+    Client side limits of one venue, shared by every tradable, screener and websocket object.
+    Requests take tokens from the buckets of their endpoint before they are sent, and the usage
+    headers of the responses bring the buckets in line with what the exchange counted.
+    """
+    venue = ""
+    RESERVE = 0.1
+
+    __instances = {}
+    __instances_lock = Lock()
+
+    def __init__(self):
+        self.buckets = {}
+        self.buckets_lock = Lock()
+
+    @classmethod
+    def get_instance(cls, venue: str) -> "RateLimiter":
+        with cls.__instances_lock:
+            if venue not in cls.__instances:
+                limiter_class = next(sub for sub in RateLimiter.__subclasses__() if sub.venue == venue)
+                cls.__instances[venue] = limiter_class()
+            return cls.__instances[venue]
+
+    def bucket(self, name: str) -> TokenBucket:
+        with self.buckets_lock:
+            if name not in self.buckets:
+                self.buckets[name] = self.create_bucket(name)
+            return self.buckets[name]
+
+    def create_bucket(self, name: str) -> TokenBucket:
+        raise NotImplementedError
+
+    def costs(self, method: str, path: str, params: dict) -> dict[str, int]:
+        """Tokens the request takes from each bucket."""
+        raise NotImplementedError
+
+    def priority(self, method: str, path: str) -> int:
+        raise NotImplementedError
+
+    def update(self, method: str, path: str, headers):
+        raise NotImplementedError
+
+    def acquire(self, method: str, path: str, params: dict = None, priority: int = None,
+                timeout: float = None) -> bool:
+        priority = priority if priority is not None else self.priority(method, path)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        taken = []
+        for name, weight in self.costs(method, path, params if params is not None else {}).items():
+            bucket = self.bucket(name)
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if not bucket.acquire(weight, priority, remaining):
+                # the request is not sent, the tokens of the buckets passed so far go back
+                for taken_bucket, taken_weight in taken:
+                    taken_bucket.release(taken_weight)
+                return False
+            taken.append((bucket, weight))
+        return True
+
+    def acquire_url(self, method: str, url: str, params: dict = None, priority: int = None) -> str:
+        """acquire for a full url, returns its path for the following update."""
+        parts = urlsplit(url)
+        self.acquire(method, parts.path, dict(parse_qsl(parts.query), **(params or {})), priority)
+        return parts.path
+
+    def request(self, method: str, url: str, priority: int = None, **kwargs) -> requests.Response:
+        """Send a public or self signed request through the limiter."""
+        path = self.acquire_url(method, url, kwargs.get("params"), priority)
+        response = HttpSessions.get_session(self.venue).request(method, url, **kwargs)
+        self.update(method, path, response.headers)
+        return response
+
+    def get(self, url: str, priority: int = None, **kwargs) -> requests.Response:
+        return self.request("GET", url, priority, **kwargs)
+
+    def stats(self) -> dict[str, float]:
+        with self.buckets_lock:
+            buckets = dict(self.buckets)
+        return {name: bucket.available() for name, bucket in sorted(buckets.items())}
+
+
+class BinanceRateLimiter(RateLimiter):
+    """IP request weight per minute, plus the order count per minute of the account."""
+    venue = "Binance"
+    WEIGHT_LIMIT = 2400
+    ORDER_LIMIT = 1200
+    WINDOW = 60
+
+    WEIGHTS = {
+        "/fapi/v2/balance": 5,
+        "/fapi/v1/userTrades": 5,
+        "/fapi/v2/positionRisk": 5,
+        "/fapi/v1/income": 30,
+        "/fapi/v1/exchangeInfo": 1,
+        "/fapi/v1/leverageBracket": 1,
+    }
+    ORDER_PATHS = {"/fapi/v1/order"}
+
+    def create_bucket(self, name: str) -> TokenBucket:
+        if name == "orders":
+            return TokenBucket(self.ORDER_LIMIT, self.WINDOW, self.RESERVE)
+        return TokenBucket(self.WEIGHT_LIMIT, self.WINDOW, self.RESERVE)
+
+    def costs(self, method: str, path: str, params: dict) -> dict[str, int]:
+        if path == "/fapi/v1/depth":
+            weight = self.depth_weight(int(params.get("limit", 500)))
+        elif path == "/fapi/v1/premiumIndex" and "symbol" not in params:
+            weight = 10
+        else:
+            weight = self.WEIGHTS.get(path, 1)
+        if method == "POST" and path in self.ORDER_PATHS:
+            return {"weight": weight, "orders": 1}
+        return {"weight": weight}
+
+    def priority(self, method: str, path: str) -> int:
+        if method in ("POST", "DELETE") and path in self.ORDER_PATHS:
+            return TokenBucket.ORDER
+        if path in ("/fapi/v1/depth", "/fapi/v1/premiumIndex", "/fapi/v1/exchangeInfo"):
+            return TokenBucket.MARKET_DATA
+        return TokenBucket.ACCOUNT
+
+    def update(self, method: str, path: str, headers):
+        if "X-MBX-USED-WEIGHT-1M" in headers:
+            self.bucket("weight").sync(int(headers["X-MBX-USED-WEIGHT-1M"]))
+        if "X-MBX-ORDER-COUNT-1M" in headers:
+            self.bucket("orders").sync(int(headers["X-MBX-ORDER-COUNT-1M"]))
+
+    @staticmethod
+    def depth_weight(limit: int) -> int:
+        if limit <= 50:
+            return 2
+        if limit <= 100:
+            return 5
+        if limit <= 500:
+            return 10
+        return 20
+
+
+class ByBitRateLimiter(RateLimiter):
+    """
+    Public market data shares one IP budget, every private endpoint has its own per second limit
+    that the exchange reports in X-Bapi-Limit and X-Bapi-Limit-Status.
+    """
+    venue = "ByBit"
+    MARKET_LIMIT = 3000
+    MARKET_WINDOW = 60
+    ENDPOINT_LIMIT = 10
+    ENDPOINT_WINDOW = 1
+
+    ORDER_PATHS = {"/contract/v3/private/order/create", "/contract/v3/private/order/cancel"}
+
+    def create_bucket(self, name: str) -> TokenBucket:
+        if name == "market":
+            return TokenBucket(self.MARKET_LIMIT, self.MARKET_WINDOW, self.RESERVE)
+        return TokenBucket(self.ENDPOINT_LIMIT, self.ENDPOINT_WINDOW, self.RESERVE)
+
+    def costs(self, method: str, path: str, params: dict) -> dict[str, int]:
+        if "/public/" in path:
+            return {"market": 1}
+        return {path: 1}
+
+    def priority(self, method: str, path: str) -> int:
+        if path in self.ORDER_PATHS:
+            return TokenBucket.ORDER
+        if "/public/" in path:
+            return TokenBucket.MARKET_DATA
+        return TokenBucket.ACCOUNT
+
+    def update(self, method: str, path: str, headers):
+        if "/public/" in path or "X-Bapi-Limit-Status" not in headers:
+            return
+        limit = int(headers["X-Bapi-Limit"]) if "X-Bapi-Limit" in headers else None
+        remaining = int(headers["X-Bapi-Limit-Status"])
+        reset_in = None
+        if "X-Bapi-Limit-Reset-Timestamp" in headers:
+            reset_in = max(0., int(headers["X-Bapi-Limit-Reset-Timestamp"]) / 1000 - time.time())
+        bucket = self.bucket(path)
+        bucket.sync((limit if limit is not None else bucket.capacity) - remaining, limit, reset_in)
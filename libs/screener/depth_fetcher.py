@@ -0,0 +1,34 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterable, Iterator
+
+
+class BulkDepthFetcher:
+    MAX_WORKERS = 8
+
+    def __init__(self, get_depth: Callable[[str, int], dict], max_workers: int = MAX_WORKERS):
+        """
+        Args:
+            get_depth: function which downloads depth for one ticker, it waits for the rate limiter of the venue
+            max_workers: how many requests are in flight at once
+        """
+        self.get_depth = get_depth
+        self.max_workers = max_workers
+
+    def fetch(self, tickers: Iterable[str], limit: int = 10) -> Iterator[tuple[str, dict]]:
+        """
+        Yields (ticker, depth) in the order the responses arrive, failed tickers are logged and skipped
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.get_depth, ticker, limit): ticker for ticker in tickers}
+            try:
+                for future in as_completed(futures):
+                    try:
+                        depth = future.result()
+                    except Exception:
+                        logging.exception(f"Can't get depth for {futures[future]}")
+                        continue
+                    yield futures[future], depth
+            finally:
+                for future in futures:
+                    future.cancel()
@@ -0,0 +1,42 @@
+import asyncio
+from decimal import Decimal
+
+import aiohttp
+
+from libs.rate_limiter import RateLimiter
+
+
+class AsyncExchange:
+    """
+    Async variants of the screener exchange calls, mixed in before the exchange class.
+    HTTP goes through the shared aiohttp session, blocking metadata lookups run in a thread.
+    """
+    def __init__(self, session: aiohttp.ClientSession, tickers_list: list = None, auth_data: dict = None):
+        self.session = session
+        super().__init__(tickers_list, auth_data)
+
+    @classmethod
+    async def create(cls, session: aiohttp.ClientSession, auth_data: dict = None) -> "AsyncExchange":
+        return cls(session, await asyncio.to_thread(cls.get_tickers), auth_data)
+
+    async def get_json(self, url: str, headers: dict = None):
+        limiter = RateLimiter.get_instance(self.exchange_name)
+        path = await asyncio.to_thread(limiter.acquire_url, "GET", url)
+        async with self.session.get(url, headers=headers) as req:
+            limiter.update("GET", path, req.headers)
+            if req.status != 200:
+                raise ConnectionError(await req.text())
+            return await req.json(content_type=None)
+
+    async def get_futures_depth_async(self, ticker: str, limit: int = 10) -> dict:
+        return self.parse_depth(await self.get_json(self.DEPTH_URL.format(ticker=ticker, limit=limit)))
+
+    async def get_funding_rate_async(self, quote_asset: str = None) -> dict:
+        return self.parse_funding_rate(await self.get_json(self.FUNDING_URL), quote_asset)
+
+    async def get_multiplier_async(self, symbol: str) -> Decimal:
+        return await asyncio.to_thread(self.get_multiplier, symbol)
+
+    async def get_max_leverage_for_usdt_amount_async(self, symbol: str,
+                                                     usdt_amount: Decimal) -> tuple[Decimal, Decimal]:
+        return await asyncio.to_thread(self.get_max_leverage_for_usdt_amount, symbol, usdt_amount)
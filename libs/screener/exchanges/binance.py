@@ -1,10 +1,11 @@
-import hashlib
-import hmac
-import time
 from decimal import Decimal
-from urllib.parse import urlencode
+from typing import Callable, Iterable, Iterator
 
-import requests
+from libs.leverage_brackets import LeverageBrackets
+from libs.objects.FundingTable import FundingTable
+from libs.rate_limiter import RateLimiter
+from libs.screener.depth_fetcher import BulkDepthFetcher
+from libs.symbols_metadata import SymbolsMetadata
 
 
 class Binance:
@@ -17,6 +18,9 @@ class Binance:
 
     RETRY_COUNT = 3
 
+    DEPTH_URL = "https://fapi.binance.com/fapi/v1/depth?symbol={ticker}&limit={limit}"
+    FUNDING_URL = "https://fapi.binance.com/fapi/v1/premiumIndex"
+
     def __init__(self, tickers_list=None, auth_data=None):
         self.tickers_list = tickers_list
         if tickers_list is None:
@@ -26,90 +30,67 @@ class Binance:
 
     @staticmethod
     def get_multiplier(symbol_to_find: str) -> Decimal:
-        exchange_info = requests.get("https://fapi.binance.com/fapi/v1/exchangeInfo").json()
-        for symbol in exchange_info['symbols']:
-            if symbol['symbol'] == symbol_to_find:
-                for exchange_filter in symbol["filters"]:
-                    if exchange_filter["filterType"] == "LOT_SIZE":
-                        return Decimal(exchange_filter["stepSize"])
-
-    def get_futures_depth(self, ticker: str = None, limit: int = 10) -> dict:
+        symbol_info = SymbolsMetadata.get_instance(Binance.exchange_name).get(symbol_to_find)
+        if symbol_info is not None:
+            return symbol_info.step_size
+
+    def get_futures_depth(self, ticker: str = None, limit: int = 10,
+                          callback: Callable[[str, dict], None] = None) -> dict:
         if ticker is not None:
-            req = requests.get(f"https://fapi.binance.com/fapi/v1/depth?symbol={ticker}&limit={limit}")
-            if req.status_code != 200:
-                raise ConnectionError
-            req_json = req.json()
-            result = {"bids": req_json["bids"], "asks": req_json["asks"]}
-        else:
-            result = {}
-            for ticker in self.tickers_list:
-                req = requests.get(f"https://fapi.binance.com/fapi/v1/depth?symbol={ticker}&limit={limit}")
-                if req.status_code != 200:
-                    raise ConnectionError
-                req_json = req.json()
-                result[ticker] = {"bids": [[Decimal(elem[0]), Decimal(elem[1])] for elem in req_json["bids"]],
-                                  "asks": [[Decimal(elem[0]), Decimal(elem[1])] for elem in req_json["asks"]]}
+            return self.get_ticker_depth(ticker, limit)
+        result = {}
+        for ticker, depth in self.iter_futures_depth(limit=limit):
+            result[ticker] = depth
+            if callback is not None:
+                callback(ticker, depth)
         return result
 
-    def get_funding_rate(self, quote_asset: str = None) -> dict:
-        req = requests.get("https://fapi.binance.com/fapi/v1/premiumIndex")
+    def get_ticker_depth(self, ticker: str, limit: int = 10) -> dict:
+        req = RateLimiter.get_instance(self.exchange_name).get(self.DEPTH_URL.format(ticker=ticker, limit=limit))
+        if req.status_code != 200:
+            raise ConnectionError(req.text)
+        return self.parse_depth(req.json())
+
+    def iter_futures_depth(self, tickers: list[str] = None, limit: int = 10,
+                           max_workers: int = BulkDepthFetcher.MAX_WORKERS) -> Iterator[tuple[str, dict]]:
+        fetcher = BulkDepthFetcher(self.get_ticker_depth, max_workers)
+        return fetcher.fetch(tickers if tickers is not None else self.tickers_list, limit)
+
+    @staticmethod
+    def parse_depth(req_json: dict) -> dict:
+        return {"bids": [[Decimal(elem[0]), Decimal(elem[1])] for elem in req_json["bids"]],
+                "asks": [[Decimal(elem[0]), Decimal(elem[1])] for elem in req_json["asks"]]}
+
+    def get_funding_rate(self, quote_asset: str = None, funding_table: FundingTable = None) -> dict:
+        if funding_table is not None:
+            return self.filter_funding_rates(funding_table.funding_rates(), quote_asset)
+        req = RateLimiter.get_instance(self.exchange_name).get(self.FUNDING_URL)
         if req.status_code != 200:
             raise ConnectionError
-        req_json = req.json()
+        return self.parse_funding_rate(req.json(), quote_asset)
+
+    def parse_funding_rate(self, req_json: list, quote_asset: str = None) -> dict:
+        return self.filter_funding_rates(((pair["symbol"], pair["lastFundingRate"]) for pair in req_json),
+                                         quote_asset)
+
+    def filter_funding_rates(self, funding_rates: Iterable[tuple[str, str]], quote_asset: str = None) -> dict:
         result = {}
-        for pair in req_json:
+        for symbol, funding_rate in funding_rates:
             if self.tickers_list is not None:
-                if pair["symbol"] not in self.tickers_list:
+                if symbol not in self.tickers_list:
                     continue
             if quote_asset is not None:
-                if not pair["symbol"].endswith(quote_asset):
+                if not symbol.endswith(quote_asset):
                     continue
-                if pair["symbol"] in self.blacklist:
+                if symbol in self.blacklist:
                     continue
-            result[pair["symbol"]] = {"funding_rate": Decimal(pair["lastFundingRate"]) * 100,
-                                      "original_symbol": pair["symbol"]}
+            result[symbol] = {"funding_rate": Decimal(funding_rate) * 100,
+                              "original_symbol": symbol}
         return result
 
     @staticmethod
     def get_tickers(contract_type: str = "PERPETUAL") -> list[str]:
-        req = requests.get("https://fapi.binance.com/fapi/v1/exchangeInfo")
-        if req.status_code != 200:
-            raise ConnectionError
-        req_json = req.json()
-        tickers_list = []
-        for ticker in req_json["symbols"]:
-            if ticker["contractType"] == contract_type and ticker["status"] == "TRADING":
-                tickers_list.append(ticker["symbol"])
-
-        return tickers_list
+        return SymbolsMetadata.get_instance(Binance.exchange_name).get_symbols(contract_type, "TRADING")
 
     def get_max_leverage_for_usdt_amount(self, symbol: str, usdt_amount: Decimal) -> tuple[Decimal, Decimal]:
-        counter = 0
-        response = None
-        while counter < self.RETRY_COUNT:
-            try:
-                params = {
-                    "symbol": symbol,
-                    "timestamp": int(time.time() * 1000),
-                    "recvWindow": 59999
-                }
-
-                string_for_sign = urlencode(params)
-                params['signature'] = hmac.new(bytes(self.auth_data["api_sec"], "UTF-8"),
-                                               bytes(string_for_sign, "UTF-8"),
-                                               hashlib.sha256).hexdigest()
-                response = requests.get(f"https://fapi.binance.com/fapi/v1/leverageBracket?" + urlencode(params),
-                                        headers={"X-MBX-APIKEY": self.auth_data["api_key"]})
-                break
-            except BaseException:
-                counter += 1
-        if response is None:
-            raise ConnectionError("Connection error to binance")
-
-        if response.status_code != 200:
-            raise ConnectionError(response.text)
-        else:
-            response = response.json()
-            for bracket in response[0]["brackets"]:
-                if usdt_amount * bracket["initialLeverage"] < bracket["notionalCap"]:
-                    return Decimal(bracket["initialLeverage"]), Decimal("1")
+        return LeverageBrackets.get_instance(self.exchange_name, self.auth_data).get_max_leverage(symbol, usdt_amount)
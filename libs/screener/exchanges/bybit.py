@@ -1,8 +1,12 @@
 import datetime
 from decimal import Decimal
-from urllib.parse import urlencode
+from typing import Callable, Iterable, Iterator
 
-import requests
+from libs.leverage_brackets import LeverageBrackets
+from libs.objects.FundingTable import FundingTable
+from libs.rate_limiter import RateLimiter
+from libs.screener.depth_fetcher import BulkDepthFetcher
+from libs.symbols_metadata import SymbolsMetadata
 
 
 class ByBit:
@@ -11,99 +15,88 @@ class ByBit:
     taker_fee = "0.06"
     RETRY_COUNT = 3
 
-    def __init__(self, tickers_list: list = None):
+    DEPTH_URL = ("https://api.bybit.com/derivatives/v3/public/order-book/L2"
+                 "?category=linear&symbol={ticker}&limit={limit}")
+    FUNDING_URL = "https://api.bybit.com/derivatives/v3/public/tickers?category=linear"
+
+    def __init__(self, tickers_list: list = None, auth_data: dict = None):
         self.tickers_list = tickers_list
         if tickers_list is None:
             self.tickers_list = self.get_tickers()
 
+        self.auth_data = auth_data
+
     @staticmethod
     def get_multiplier(symbol: str) -> Decimal:
-        instrument_info = requests.get(f"https://api.bybit.com/derivatives/v3/public/instruments-info"
-                                       f"?symbol={symbol}"
-                                       f"&category=linear").json()
-        return Decimal(instrument_info['result']['list'][0]['lotSizeFilter']["qtyStep"])
+        symbol_info = SymbolsMetadata.get_instance(ByBit.exchange_name).get(symbol)
+        if symbol_info is not None:
+            return symbol_info.step_size
 
-    def get_futures_depth(self, ticker: str = None, limit: int = 10) -> dict:
+    def get_futures_depth(self, ticker: str = None, limit: int = 10,
+                          callback: Callable[[str, dict], None] = None) -> dict:
         if ticker is not None:
-            req = requests.get(f"https://api.bybit.com/derivatives/v3/public/order-book/L2"
-                               f"?category=linear&symbol={ticker}"
-                               f"&limit={limit}")
-            if req.status_code != 200:
-                raise ConnectionError
-            req_json = req.json()
-            result = {"bids": req_json["result"]["b"], "asks": req_json["result"]["a"]}
-        else:
-            result = {}
-            for ticker in self.tickers_list:
-                req = requests.get(f"https://api.bybit.com/derivatives/v3/public/order-book/L2"
-                                   f"?category=linear&symbol={ticker}"
-                                   f"&limit={limit}")
-                if req.status_code != 200:
-                    raise ConnectionError
-                req_json = req.json()
-                result[ticker] = {"bids": [[Decimal(elem[0]), Decimal(elem[1])] for elem in req_json["result"]["b"]],
-                                  "asks": [[Decimal(elem[0]), Decimal(elem[1])] for elem in req_json["result"]["a"]]}
+            return self.get_ticker_depth(ticker, limit)
+        result = {}
+        for ticker, depth in self.iter_futures_depth(limit=limit):
+            result[ticker] = depth
+            if callback is not None:
+                callback(ticker, depth)
         return result
 
-    def get_funding_rate(self, quote_asset: str = None) -> dict:
-        req = requests.get(f"https://api.bybit.com/derivatives/v3/public/tickers?category=linear")
+    def get_ticker_depth(self, ticker: str, limit: int = 10) -> dict:
+        req = RateLimiter.get_instance(self.exchange_name).get(self.DEPTH_URL.format(ticker=ticker, limit=limit))
+        if req.status_code != 200:
+            raise ConnectionError(req.text)
+        return self.parse_depth(req.json())
+
+    def iter_futures_depth(self, tickers: list[str] = None, limit: int = 10,
+                           max_workers: int = BulkDepthFetcher.MAX_WORKERS) -> Iterator[tuple[str, dict]]:
+        fetcher = BulkDepthFetcher(self.get_ticker_depth, max_workers)
+        return fetcher.fetch(tickers if tickers is not None else self.tickers_list, limit)
+
+    @staticmethod
+    def parse_depth(req_json: dict) -> dict:
+        return {"bids": [[Decimal(elem[0]), Decimal(elem[1])] for elem in req_json["result"]["b"]],
+                "asks": [[Decimal(elem[0]), Decimal(elem[1])] for elem in req_json["result"]["a"]]}
+
+    def get_funding_rate(self, quote_asset: str = None, funding_table: FundingTable = None) -> dict:
+        if funding_table is not None:
+            return self.filter_funding_rates(funding_table.funding_rates(), quote_asset)
+        req = RateLimiter.get_instance(self.exchange_name).get(self.FUNDING_URL)
         if req.status_code != 200:
             raise ConnectionError
-        req_json = req.json()
+        return self.parse_funding_rate(req.json(), quote_asset)
+
+    def parse_funding_rate(self, req_json: dict, quote_asset: str = None) -> dict:
+        return self.filter_funding_rates(((pair["symbol"], pair["fundingRate"]) for pair in req_json["result"]["list"]),
+                                         quote_asset)
+
+    def filter_funding_rates(self, funding_rates: Iterable[tuple[str, str]], quote_asset: str = None) -> dict:
         result = {}
-        for pair in req_json["result"]["list"]:
+        for symbol, funding_rate in funding_rates:
             if self.tickers_list is not None:
-                if pair["symbol"] not in self.tickers_list:
+                if symbol not in self.tickers_list:
                     continue
                 if quote_asset is not None:
-                    if not pair["symbol"].endswith(quote_asset):
+                    if not symbol.endswith(quote_asset):
                         continue
-            result[pair["symbol"]] = {"funding_rate": Decimal(pair["fundingRate"]) * 100,
-                                      "original_symbol": pair["symbol"]}
+            result[symbol] = {"funding_rate": Decimal(funding_rate) * 100,
+                              "original_symbol": symbol}
         return result
 
-    def get_max_leverage_for_usdt_amount(self, symbol: str) -> tuple[Decimal, Decimal]:
-        counter = 0
-        response = None
-        while counter < self.RETRY_COUNT:
-            try:
-                params = {
-                    "symbol": symbol
-                }
-
-                response = requests.get(
-                    f"https://api.bybit.com/derivatives/v3/public/instruments-info?" + urlencode(params))
-                break
-            except BaseException:
-                counter += 1
-
-        if response is None:
-            raise ConnectionError("Connection error to bybit")
-
-        if response.status_code != 200:
-            raise ConnectionError(response.text)
-        else:
-            response = response.json()
-            return Decimal(response["result"]["list"][0]["leverageFilter"]["maxLeverage"]), \
-                Decimal(response["result"]["list"][0]["leverageFilter"]["leverageStep"])
+    def get_max_leverage_for_usdt_amount(self, symbol: str, usdt_amount: Decimal) -> tuple[Decimal, Decimal]:
+        return LeverageBrackets.get_instance(self.exchange_name).get_max_leverage(symbol, usdt_amount)
 
     @staticmethod
     def get_tickers(contract_type: str = "linearPerpetual") -> list[str]:
-        req = requests.get(f"https://api.bybit.com/derivatives/v3/public/instruments-info?contractType={contract_type}")
-        if req.status_code != 200:
-            raise ConnectionError
-        req_json = req.json()
-        tickers_list = []
-        for ticker in req_json["result"]["list"]:
-            tickers_list.append(ticker["symbol"])
-        return tickers_list
+        return SymbolsMetadata.get_instance(ByBit.exchange_name).get_symbols(contract_type)
 
     @staticmethod
     def get_kline_open_price(symbol: str, dtime: datetime.datetime, interval: str = "30") -> str:
-        req = requests.get(f"https://api.bybit.com/derivatives/v3/public/kline"
-                           f"?symbol={symbol}"
-                           f"&start={int(dtime.timestamp() * 1000)}"
-                           f"&end={int(dtime.timestamp() * 1000) + 999}"
-                           f"&limit=1&interval={interval}")
+        req = RateLimiter.get_instance(ByBit.exchange_name).get(f"https://api.bybit.com/derivatives/v3/public/kline"
+                                                                f"?symbol={symbol}"
+                                                                f"&start={int(dtime.timestamp() * 1000)}"
+                                                                f"&end={int(dtime.timestamp() * 1000) + 999}"
+                                                                f"&limit=1&interval={interval}")
         kline = req.json()
         return kline["result"]["list"][0][1]
@@ -0,0 +1,6 @@
+from libs.screener.exchanges.async_exchange import AsyncExchange
+from libs.screener.exchanges.bybit import ByBit
+
+
+class AsyncByBit(AsyncExchange, ByBit):
+    pass
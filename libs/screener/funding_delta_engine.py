@@ -0,0 +1,105 @@
+import itertools
+from decimal import Decimal
+
+import numpy as np
+
+from libs.funding_calculator import calculate_delta
+
+
+class FundingDeltaEngine:
+    RANKING_DTYPE = np.dtype([
+        ("exchange_1", "U32"),
+        ("exchange_2", "U32"),
+        ("symbol", "U64"),
+        ("ticker_1", "U64"),
+        ("ticker_2", "U64"),
+        ("funding_rate_1", "f8"),
+        ("funding_rate_2", "f8"),
+        ("delta_without_fee", "f8"),
+        ("delta_with_fee", "f8"),
+        ("fee_1", "f8"),
+        ("fee_2", "f8")
+    ])
+
+    def __init__(self, collected_dict: dict):
+        """
+        Args:
+            collected_dict: {exchange: {"funding": {symbol: {"funding_rate", "original_symbol"}}, "fee": fee}}
+        """
+        self.collected_dict = collected_dict
+        self.exchanges = list(collected_dict.keys())
+        self.symbols = sorted(set(itertools.chain.from_iterable(
+            collected_dict[exchange]["funding"].keys() for exchange in self.exchanges)))
+        symbol_index = {symbol: idx for idx, symbol in enumerate(self.symbols)}
+
+        self.funding_rates = np.full((len(self.exchanges), len(self.symbols)), np.nan)
+        self.original_symbols = np.full((len(self.exchanges), len(self.symbols)), "", dtype="U64")
+        self.fees = np.zeros(len(self.exchanges))
+        for ex_idx, exchange in enumerate(self.exchanges):
+            self.fees[ex_idx] = float(collected_dict[exchange]["fee"])
+            for symbol, funding in collected_dict[exchange]["funding"].items():
+                self.funding_rates[ex_idx, symbol_index[symbol]] = float(funding["funding_rate"])
+                self.original_symbols[ex_idx, symbol_index[symbol]] = funding["original_symbol"]
+
+    @staticmethod
+    def calculate_deltas(funding_1: np.ndarray, funding_2: np.ndarray, fee_1: np.ndarray | float,
+                         fee_2: np.ndarray | float) -> np.ndarray:
+        delta = np.where((funding_1 != 0) & (funding_2 != 0), np.abs(funding_1 - funding_2), 0)
+        return delta - (fee_1 + fee_2) * 2
+
+    def rank(self, min_delta_with_fee: float = None) -> np.ndarray:
+        """
+        Returns:
+            structured array with RANKING_DTYPE for every exchange pair and common symbol,
+            sorted by delta_with_fee descending
+        """
+        if len(self.exchanges) < 2 or len(self.symbols) == 0:
+            return np.empty(0, dtype=self.RANKING_DTYPE)
+
+        ex_1_idx, ex_2_idx = np.triu_indices(len(self.exchanges), 1)
+        funding_1, funding_2 = self.funding_rates[ex_1_idx], self.funding_rates[ex_2_idx]
+        fee_1, fee_2 = self.fees[ex_1_idx][:, None], self.fees[ex_2_idx][:, None]
+
+        delta_without_fee = self.calculate_deltas(funding_1, funding_2, 0, 0)
+        delta_with_fee = self.calculate_deltas(funding_1, funding_2, fee_1, fee_2)
+
+        mask = ~np.isnan(funding_1) & ~np.isnan(funding_2)
+        if min_delta_with_fee is not None:
+            mask &= delta_with_fee > min_delta_with_fee
+        pair_idx, symbol_idx = np.nonzero(mask)
+
+        exchanges = np.array(self.exchanges, dtype="U32")
+        ranking = np.empty(len(pair_idx), dtype=self.RANKING_DTYPE)
+        ranking["exchange_1"] = exchanges[ex_1_idx[pair_idx]]
+        ranking["exchange_2"] = exchanges[ex_2_idx[pair_idx]]
+        ranking["symbol"] = np.array(self.symbols, dtype="U64")[symbol_idx]
+        ranking["ticker_1"] = self.original_symbols[ex_1_idx[pair_idx], symbol_idx]
+        ranking["ticker_2"] = self.original_symbols[ex_2_idx[pair_idx], symbol_idx]
+        ranking["funding_rate_1"] = funding_1[pair_idx, symbol_idx]
+        ranking["funding_rate_2"] = funding_2[pair_idx, symbol_idx]
+        ranking["delta_without_fee"] = delta_without_fee[pair_idx, symbol_idx]
+        ranking["delta_with_fee"] = delta_with_fee[pair_idx, symbol_idx]
+        ranking["fee_1"] = self.fees[ex_1_idx[pair_idx]]
+        ranking["fee_2"] = self.fees[ex_2_idx[pair_idx]]
+        return ranking[np.argsort(-ranking["delta_with_fee"], kind="stable")]
+
+    def to_rows(self, ranking: np.ndarray) -> list[list]:
+        """
+        Converts ranked candidates back to the screener row layout with exact Decimal values
+        """
+        rows = []
+        for candidate in ranking:
+            ex1, ex2, symbol = str(candidate["exchange_1"]), str(candidate["exchange_2"]), str(candidate["symbol"])
+            funding_1 = self.collected_dict[ex1]["funding"][symbol]
+            funding_2 = self.collected_dict[ex2]["funding"][symbol]
+            fee_1, fee_2 = Decimal(self.collected_dict[ex1]["fee"]), Decimal(self.collected_dict[ex2]["fee"])
+            rows.append([ex1, ex2,
+                         funding_1["original_symbol"],
+                         funding_2["original_symbol"],
+                         funding_1["funding_rate"],
+                         funding_2["funding_rate"],
+                         calculate_delta(funding_1["funding_rate"], funding_2["funding_rate"], 0, 0),
+                         calculate_delta(funding_1["funding_rate"], funding_2["funding_rate"], fee_1, fee_2),
+                         fee_1,
+                         fee_2])
+        return rows
@@ -0,0 +1,95 @@
+import heapq
+from decimal import Decimal
+
+
+class OpportunitySelector:
+    MAX_CANDIDATES = 32
+    MAX_NODES = 100000
+
+    def __init__(self, usdt_amount: Decimal, exchange_capital: dict = None, max_candidates: int = MAX_CANDIDATES,
+                 max_nodes: int = MAX_NODES):
+        """
+        Args:
+            usdt_amount: capital used by one leg of the trade
+            exchange_capital: available capital per exchange, one trade per exchange if not set
+            max_candidates: how many best candidates are passed to the solver
+            max_nodes: search budget of the solver, the best found selection is returned when it is exhausted
+        """
+        self.usdt_amount = Decimal(usdt_amount)
+        self.exchange_capital = exchange_capital
+        self.max_candidates = max_candidates
+        self.max_nodes = max_nodes
+
+    def capacity(self, exchange: str) -> int:
+        if self.exchange_capital is None:
+            return 1
+        if exchange not in self.exchange_capital or self.usdt_amount <= 0:
+            return 0
+        return int(Decimal(self.exchange_capital[exchange]) // self.usdt_amount)
+
+    @staticmethod
+    def legs(candidate: list) -> tuple:
+        return (candidate[0], candidate[2]), (candidate[1], candidate[3])
+
+    def select(self, candidates: list[list], value_idx: int = 7, busy_legs: set = None) -> list[list]:
+        """
+        Args:
+            candidates: screener rows [exchange_1, exchange_2, ticker_1, ticker_2, ...]
+            value_idx: index of the value to maximize
+            busy_legs: (exchange, ticker) pairs that are already in work
+        Returns:
+            non-conflicting candidates with maximal total value which fit into exchange capital,
+            sorted by value descending
+        """
+        busy_legs = busy_legs or set()
+        top_candidates = heapq.nlargest(
+            self.max_candidates,
+            (candidate for candidate in candidates
+             if candidate[value_idx] > 0 and not busy_legs.intersection(self.legs(candidate))),
+            key=lambda candidate: candidate[value_idx])
+        if not top_candidates:
+            return []
+
+        values = [candidate[value_idx] for candidate in top_candidates]
+        capacity = {}
+        for candidate in top_candidates:
+            for exchange in candidate[:2]:
+                capacity[exchange] = self.capacity(exchange)
+
+        # suffix sums for the optimistic bound of the branch
+        suffix = [Decimal(0)] * (len(values) + 1)
+        for idx in range(len(values) - 1, -1, -1):
+            suffix[idx] = suffix[idx + 1] + values[idx]
+
+        best = {"value": Decimal(0), "selection": []}
+        used_legs = set()
+        selection = []
+        nodes = [0]
+
+        def fits(candidate):
+            return (capacity[candidate[0]] > 0 and capacity[candidate[1]] > 0 and
+                    not used_legs.intersection(self.legs(candidate)))
+
+        def search(idx, value):
+            nodes[0] += 1
+            if value > best["value"]:
+                best["value"], best["selection"] = value, selection.copy()
+            if idx == len(top_candidates) or nodes[0] > self.max_nodes:
+                return
+            if value + suffix[idx] <= best["value"]:
+                return
+            candidate = top_candidates[idx]
+            if fits(candidate):
+                capacity[candidate[0]] -= 1
+                capacity[candidate[1]] -= 1
+                used_legs.update(self.legs(candidate))
+                selection.append(idx)
+                search(idx + 1, value + values[idx])
+                selection.pop()
+                used_legs.difference_update(self.legs(candidate))
+                capacity[candidate[0]] += 1
+                capacity[candidate[1]] += 1
+            search(idx + 1, value)
+
+        search(0, Decimal(0))
+        return [top_candidates[idx] for idx in best["selection"]]
@@ -1,17 +1,23 @@
-import itertools
 import logging
 import threading
 import time
-from decimal import Decimal
 
 from libs.exchanges.binance import Binance as BinanceTradable
 from libs.exchanges.bybit import ByBit as ByBitTradable
-from libs.funding_calculator import calculate_delta, long_short_router, calculate_crypto_amount_for_usdt, \
+from libs.exchanges.ws.binance_funding import BinanceFundingFeed
+from libs.exchanges.ws.bybit.bybit_funding import ByBitFundingFeed
+from libs.funding_calculator import long_short_router, calculate_crypto_amount_for_usdt, \
     calculate_estimate_pnl_percent
+from libs.leverage_brackets import LeverageBrackets
 from libs.misc import runtime
+from libs.objects.FixedPoint import FixedPoint
+from libs.objects.FundingTable import FundingTable
 from libs.objects.OrderBook import OrderBook
 from libs.screener.exchanges.binance import Binance
 from libs.screener.exchanges.bybit import ByBit
+from libs.screener.funding_delta_engine import FundingDeltaEngine
+from libs.screener.opportunity_selector import OpportunitySelector
+from libs.symbols_metadata import SymbolsMetadata
 from libs.thread_with_return_value import ThreadWithReturnValue
 
 
@@ -24,100 +30,50 @@ class ArbitrageChecker:
         "Binance": BinanceTradable,
         "ByBit": ByBitTradable
     }
+    funding_feed_classes = {
+        "Binance": BinanceFundingFeed,
+        "ByBit": ByBitFundingFeed
+    }
     TRADE_INSTRUCTION = {
         "long": [{"route": "BUY", "isAsk": True}, {"route": "SELL", "isAsk": False}],
         "short": [{"route": "SELL", "isAsk": False}, {"route": "BUY", "isAsk": True}]
     }
+    MIN_DELTA_WITH_FEE = 0.1
+    BOOK_READY_TIMEOUT = 10
+    FUNDING_FEED_MAX_AGE = 5
+    WARM_POOL_SIZE = 10
+    fixed_point_books = False
+    book_max_depth = None
+    multiplex_streams = False
     auth_data = None
 
+    def __init__(self):
+        self.exchanges = {}
+        self.tradable_connections = {}
+        self.prepared_leverages = {}
+        self.funding_feeds = {}
+        self.connections_lock = threading.Lock()
+
     @runtime
-    def find_arbitrage(self, usdt_amount, leverage, auth_data):
+    def find_arbitrage(self, usdt_amount, leverage, auth_data, exchange_capital=None, busy_legs=None):
         self.auth_data = auth_data
-        threads = []
-        collected_data = []
-        collected_dict = {}
-        common_tickers = {}
-
-        for exchange_class in [Binance, ByBit]:
-            threads.append(ThreadWithReturnValue(target=self.handle_exchanges, args=(exchange_class,)))
-            threads[-1].start()
-
-        for thread in threads:
-            collected_data.append(thread.waiting())
+        collected_data = self.collect_funding()
 
-        for exchange in collected_data:
-            collected_dict[exchange[1]] = {
-                "funding": exchange[0],
-                "fee": exchange[2]
-            }
-            for ticker in collected_dict[exchange[1]]["funding"].keys():
-                if ticker not in common_tickers:
-                    common_tickers[ticker] = [exchange[1]]
-                else:
-                    common_tickers[ticker].append(exchange[1])
-
-        for ticker in list(common_tickers.keys()):
-            if len(common_tickers[ticker]) < 2:
-                common_tickers.pop(ticker)
-
-        funding_deltas = []
-
-        for ticker in common_tickers:
-            for comb in itertools.combinations(common_tickers[ticker], 2):
-                ex1, ex2 = comb
-                delta_funding_without_fee = calculate_delta(collected_dict[ex1]["funding"][ticker]["funding_rate"],
-                                                            collected_dict[ex2]["funding"][ticker]["funding_rate"], 0,
-                                                            0)
-                delta_funding_with_fee = calculate_delta(collected_dict[ex1]["funding"][ticker]["funding_rate"],
-                                                         collected_dict[ex2]["funding"][ticker]["funding_rate"],
-                                                         Decimal(collected_dict[ex1]["fee"]),
-                                                         Decimal(collected_dict[ex2]["fee"]))
-                funding_deltas.append([ex1, ex2,
-                                       collected_dict[ex1]["funding"][ticker]["original_symbol"],
-                                       collected_dict[ex2]["funding"][ticker]["original_symbol"],
-                                       collected_dict[ex1]["funding"][ticker]["funding_rate"],
-                                       collected_dict[ex2]["funding"][ticker]["funding_rate"],
-                                       delta_funding_without_fee,
-                                       delta_funding_with_fee,
-                                       Decimal(collected_dict[ex1]["fee"]),
-                                       Decimal(collected_dict[ex2]["fee"])])
-
-        funding_deltas_sorted = sorted(funding_deltas, key=lambda x: x[7], reverse=True)
-        logging.info(funding_deltas_sorted)
-        funding_deltas_first_filter = []
-        exchange_in_work = []
-        for delta_funding in funding_deltas_sorted:
-            trade_candidate = delta_funding.copy()
-            if delta_funding[7] > Decimal("0.1"):
-                if delta_funding[0] not in exchange_in_work and delta_funding[1] not in exchange_in_work:
-                    exchange_in_work.append(delta_funding[0])
-                    exchange_in_work.append(delta_funding[1])
-                    funding_deltas_first_filter.append(trade_candidate)
-
-        logging.info('AFTER FIRST FILTER ' + str(funding_deltas_first_filter))
-
-        where_collect_prices = {}
-
-        for row in funding_deltas_first_filter:
-            for i in range(2):
-                if row[i] not in where_collect_prices:
-                    where_collect_prices[row[i]] = set()
-                where_collect_prices[row[i]].update([row[i + 2]])
+        funding_deltas_first_filter = self.select_opportunities(collected_data, usdt_amount, exchange_capital,
+                                                                busy_legs)
+        where_collect_prices = self.where_collect_prices(funding_deltas_first_filter)
 
         tradable_classes = {}
-        collected_prices = {}
         collected_multipliers = {}
         collected_leverages = {}
         for exchange in where_collect_prices:
-            if exchange not in collected_prices:
-                tradable_classes[exchange] = {}
-                collected_prices[exchange] = {}
-                collected_multipliers[exchange] = {}
-                collected_leverages[exchange] = {}
+            tradable_classes[exchange] = {}
+            collected_multipliers[exchange] = {}
+            collected_leverages[exchange] = {}
             for ticker in where_collect_prices[exchange]:
                 tradable_classes[exchange][ticker] = ThreadWithReturnValue(
                     target=self.init_tradable_classes_and_depth,
-                    args=(self.tradable_classes[exchange], ticker, self.auth_data[exchange], leverage))
+                    args=(exchange, ticker, self.auth_data[exchange]))
                 collected_multipliers[exchange][ticker] = ThreadWithReturnValue(
                     target=self.handle_multiplier,
                     args=(self.exchange_classes[exchange], ticker))
@@ -135,33 +91,148 @@ class ArbitrageChecker:
                 collected_leverages[exchange][ticker] = collected_leverages[exchange][ticker].waiting()
 
         for arbitrage_opportunity in funding_deltas_first_filter:
-            exchange_1, ticker_1, exchange_2, ticker_2 = (arbitrage_opportunity[0], arbitrage_opportunity[2],
-                                                          arbitrage_opportunity[1], arbitrage_opportunity[3])
+            setters = [ThreadWithReturnValue(target=setter[0], args=setter[1]) for setter in
+                       self.leverage_setters(arbitrage_opportunity, tradable_classes, collected_leverages, leverage)]
+            for setter in setters:
+                setter.start()
+            for setter in setters:
+                setter.waiting()
 
-            used_leverage = self.calculate_leverage(collected_leverages[exchange_1][ticker_1],
-                                                    collected_leverages[exchange_2][ticker_2], leverage)
-            logging.info(f"used leverage {used_leverage}")
-            setter_1 = ThreadWithReturnValue(
-                target=tradable_classes[exchange_1][ticker_1][0].set_margin_type_and_leverage,
-                args=(tradable_classes[exchange_1][ticker_1][0].ISOLATED_MARGIN, used_leverage))
-            setter_2 = ThreadWithReturnValue(
-                target=tradable_classes[exchange_2][ticker_2][0].set_margin_type_and_leverage,
-                args=(tradable_classes[exchange_2][ticker_2][0].ISOLATED_MARGIN, used_leverage))
-            setter_1.start()
-            setter_2.start()
-            setter_1.waiting()
-            setter_2.waiting()
-
-        time.sleep(10)
+        ready_books = self.wait_for_books(tradable_classes, time.time() + self.BOOK_READY_TIMEOUT)
 
+        collected_prices = {}
         for exchange in tradable_classes:
+            collected_prices[exchange] = {}
             for ticker in tradable_classes[exchange]:
                 logging.info(" ".join((exchange, ticker)))
-                bids = tradable_classes[exchange][ticker][1]["orderbook"]["bids"]
-                asks = tradable_classes[exchange][ticker][1]["orderbook"]["asks"]
-                ts = tradable_classes[exchange][ticker][1]["orderbook"]["timestamp"]
-                collected_prices[exchange][ticker] = OrderBook(ticker, bids, asks, ts)
+                if (exchange, ticker) not in ready_books:
+                    continue
+                snapshot = tradable_classes[exchange][ticker][1]["orderbook"].get("snapshot")
+                if snapshot is None:
+                    continue
+                collected_prices[exchange][ticker] = snapshot.order_book(ticker)
+
+        return self.evaluate_opportunities(funding_deltas_first_filter, tradable_classes, collected_prices,
+                                           collected_multipliers, collected_leverages, usdt_amount, leverage)
+
+    def collect_funding(self):
+        threads = []
+        collected_data = []
+
+        for exchange_class in self.exchange_classes.values():
+            threads.append(ThreadWithReturnValue(target=self.handle_exchanges, args=(exchange_class,)))
+            threads[-1].start()
+
+        for thread in threads:
+            collected_data.append(thread.waiting())
+        return collected_data
 
+    def rank_candidates(self, collected_data):
+        collected_dict = {}
+        for exchange in collected_data:
+            collected_dict[exchange[1]] = {
+                "funding": exchange[0],
+                "fee": exchange[2]
+            }
+
+        funding_delta_engine = FundingDeltaEngine(collected_dict)
+        funding_deltas_ranking = funding_delta_engine.rank()
+        logging.info(funding_deltas_ranking)
+        return funding_delta_engine.to_rows(
+            funding_deltas_ranking[funding_deltas_ranking["delta_with_fee"] > self.MIN_DELTA_WITH_FEE])
+
+    def select_opportunities(self, collected_data, usdt_amount, exchange_capital=None, busy_legs=None):
+        funding_deltas_sorted = self.rank_candidates(collected_data)
+        funding_deltas_first_filter = OpportunitySelector(usdt_amount, exchange_capital).select(
+            funding_deltas_sorted, busy_legs=busy_legs)
+
+        logging.info('AFTER FIRST FILTER ' + str(funding_deltas_first_filter))
+        return funding_deltas_first_filter
+
+    @staticmethod
+    def where_collect_prices(funding_deltas_first_filter):
+        where_collect_prices = {}
+
+        for row in funding_deltas_first_filter:
+            for i in range(2):
+                if row[i] not in where_collect_prices:
+                    where_collect_prices[row[i]] = set()
+                where_collect_prices[row[i]].update([row[i + 2]])
+        return where_collect_prices
+
+    def leverage_setters(self, arbitrage_opportunity, tradable_classes, collected_leverages, leverage):
+        exchange_1, ticker_1, exchange_2, ticker_2 = (arbitrage_opportunity[0], arbitrage_opportunity[2],
+                                                      arbitrage_opportunity[1], arbitrage_opportunity[3])
+
+        used_leverage = self.calculate_leverage(collected_leverages[exchange_1][ticker_1],
+                                                collected_leverages[exchange_2][ticker_2], leverage)
+        logging.info(f"used leverage {used_leverage}")
+        return [(self.prepare_leverage, (exchange, ticker, tradable_classes[exchange][ticker][0], used_leverage))
+                for exchange, ticker in ((exchange_1, ticker_1), (exchange_2, ticker_2))
+                if self.prepared_leverages.get((exchange, ticker)) != used_leverage]
+
+    def prepare_leverage(self, exchange, ticker, t_class, used_leverage):
+        t_class.set_margin_type_and_leverage(t_class.ISOLATED_MARGIN, used_leverage)
+        with self.connections_lock:
+            self.prepared_leverages[(exchange, ticker)] = used_leverage
+
+    @runtime
+    def warm_up(self, usdt_amount, leverage, auth_data, top_n=None, busy_legs=None):
+        """Keep connections and leverage ready for the best ranked symbols before the funding scan."""
+        self.auth_data = auth_data
+        if top_n is None:
+            top_n = self.WARM_POOL_SIZE
+        watchlist = self.rank_candidates(self.collect_funding())[:top_n]
+        watched_legs = set()
+        for row in watchlist:
+            watched_legs.update(OpportunitySelector.legs(row))
+
+        tradable_classes = {}
+        collected_leverages = {}
+        threads = {}
+        for exchange, ticker in watched_legs:
+            threads[(exchange, ticker)] = (
+                ThreadWithReturnValue(target=self.init_tradable_classes_and_depth,
+                                      args=(exchange, ticker, self.auth_data[exchange])),
+                ThreadWithReturnValue(target=self.handle_leverages,
+                                      args=(self.exchange_classes[exchange], ticker, usdt_amount,
+                                            self.auth_data[exchange])))
+            for thread in threads[(exchange, ticker)]:
+                thread.start()
+
+        for (exchange, ticker), (tradable_thread, leverage_thread) in threads.items():
+            tradable_classes.setdefault(exchange, {})[ticker] = tradable_thread.waiting()
+            collected_leverages.setdefault(exchange, {})[ticker] = leverage_thread.waiting()
+
+        setters = []
+        for row in watchlist:
+            if None in (collected_leverages[row[0]][row[2]], collected_leverages[row[1]][row[3]]):
+                continue
+            for setter in self.leverage_setters(row, tradable_classes, collected_leverages, leverage):
+                if setter not in setters:
+                    setters.append(setter)
+        setters = [ThreadWithReturnValue(target=setter[0], args=setter[1]) for setter in setters]
+        for setter in setters:
+            setter.start()
+        for setter in setters:
+            setter.waiting()
+
+        self.evict_connections(watched_legs | (busy_legs or set()))
+        logging.info(f"Warm pool {sorted(self.tradable_connections)}")
+        return watchlist
+
+    def evict_connections(self, keep: set):
+        with self.connections_lock:
+            evicted = [key for key in self.tradable_connections if key not in keep]
+            for key in evicted:
+                t_class, ws_metadata = self.tradable_connections.pop(key)
+                self.prepared_leverages.pop(key, None)
+                ws_metadata["thread"].stop()
+        for key in evicted:
+            logging.info(f"Evict {key} from warm pool")
+
+    def evaluate_opportunities(self, funding_deltas_first_filter, tradable_classes, collected_prices,
+                               collected_multipliers, collected_leverages, usdt_amount, leverage):
         funding_deltas_with_price_delta = []
         for arbitrage_opportunity in funding_deltas_first_filter:
             arbitrage_opportunity_copy = arbitrage_opportunity.copy()
@@ -171,15 +242,18 @@ class ArbitrageChecker:
                                                         arbitrage_opportunity[2], arbitrage_opportunity[1],
                                                         arbitrage_opportunity[5], arbitrage_opportunity[3],
                                                         arbitrage_opportunity[8], arbitrage_opportunity[9])
+            if ticker_1 not in collected_prices[exchange_1] or ticker_2 not in collected_prices[exchange_2]:
+                logging.info(f"Skip {arbitrage_opportunity}: order book is not ready")
+                continue
 
             exchange_routes = long_short_router(exchange_1, funding_rate_1, exchange_2, funding_rate_2)
             logging.info(exchange_routes)
-            ex1_price = collected_prices[exchange_1][ticker_1].asks[1][0] if (
+            ex1_price = collected_prices[exchange_1][ticker_1].price("asks", 1) if (
                     self.TRADE_INSTRUCTION[exchange_routes[exchange_1]][0]["isAsk"] is True) \
-                else collected_prices[exchange_1][ticker_1].bids[1][0]
-            ex2_price = collected_prices[exchange_2][ticker_2].asks[1][0] if (
+                else collected_prices[exchange_1][ticker_1].price("bids", 1)
+            ex2_price = collected_prices[exchange_2][ticker_2].price("asks", 1) if (
                     self.TRADE_INSTRUCTION[exchange_routes[exchange_2]][0]["isAsk"] is True) \
-                else collected_prices[exchange_2][ticker_2].bids[1][0]
+                else collected_prices[exchange_2][ticker_2].price("bids", 1)
 
             used_leverage = self.calculate_leverage(collected_leverages[exchange_1][ticker_1],
                                                     collected_leverages[exchange_2][ticker_2], leverage)
@@ -214,10 +288,47 @@ class ArbitrageChecker:
             funding_deltas_with_price_delta.append(arbitrage_opportunity_copy)
         return funding_deltas_with_price_delta
 
+    def get_exchange(self, exchange):
+        with self.connections_lock:
+            if exchange.exchange_name not in self.exchanges:
+                self.exchanges[exchange.exchange_name] = exchange()
+            return self.exchanges[exchange.exchange_name]
+
+    @staticmethod
+    def wait_for_books(tradable_classes: dict, deadline: float) -> set:
+        ready_books = set()
+        for exchange in tradable_classes:
+            for ticker in tradable_classes[exchange]:
+                book_ready = tradable_classes[exchange][ticker][1]["book_ready"]
+                if book_ready.wait(max(0., deadline - time.time())):
+                    ready_books.add((exchange, ticker))
+                else:
+                    logging.warning(f"Order book {exchange} {ticker} is not ready in time")
+        return ready_books
+
+    def start_funding_feeds(self):
+        for exchange, feed_class in self.funding_feed_classes.items():
+            if exchange in self.funding_feeds:
+                continue
+            feed = feed_class(self.get_exchange(self.exchange_classes[exchange]).tickers_list)
+            feed.daemon = True
+            feed.start()
+            self.funding_feeds[exchange] = feed
+
+    def funding_table(self, exchange: str) -> FundingTable | None:
+        if exchange not in self.funding_feeds:
+            return None
+        feed = self.funding_feeds[exchange]
+        funding_table = feed.funding_table
+        if not funding_table.is_fresh(self.FUNDING_FEED_MAX_AGE, feed.tickers):
+            logging.info(f"Funding feed {exchange} is stale, falling back to REST")
+            return None
+        return funding_table
+
     @runtime
     def handle_exchanges(self, exchange):
-        ex = exchange()
-        return ex.get_funding_rate("USDT"), ex.exchange_name, ex.taker_fee
+        ex = self.get_exchange(exchange)
+        return ex.get_funding_rate("USDT", self.funding_table(ex.exchange_name)), ex.exchange_name, ex.taker_fee
 
     @runtime
     def handle_depth(self, exchange, ticker):
@@ -231,8 +342,7 @@ class ArbitrageChecker:
 
     @staticmethod
     def handle_leverages(exchange, ticker, usdt_amount, auth_data):
-        ex = exchange([], auth_data=auth_data)
-        return ex.get_max_leverage_for_usdt_amount(ticker, usdt_amount)
+        return LeverageBrackets.get_instance(exchange.exchange_name, auth_data).get_max_leverage(ticker, usdt_amount)
 
     @staticmethod
     def calculate_leverage(leverage_config_1, leverage_config_2, leverage):
@@ -246,16 +356,41 @@ class ArbitrageChecker:
             max_common_lever = min(max_lever_1, max_lever_2)
             return max_common_lever.quantize(max_step)
 
-    @staticmethod
-    def init_tradable_classes_and_depth(tradable_class, ticker, auth_data):
-
-        ws_metadata = dict(orderbook={}, order_reports={}, balancelist={}, orderlock=threading.Lock(),
-                           balancelock=threading.Lock(), reportslock=threading.Lock())
+    def get_fixed_point(self, exchange, ticker) -> FixedPoint | None:
+        if not self.fixed_point_books:
+            return None
+        symbol_info = SymbolsMetadata.get_instance(exchange).get(ticker)
+        if symbol_info is None or symbol_info.tick_size is None or symbol_info.step_size is None:
+            return None
+        return FixedPoint.from_symbol_info(symbol_info)
+
+    def init_tradable_classes_and_depth(self, exchange, ticker, auth_data):
+        with self.connections_lock:
+            if (exchange, ticker) in self.tradable_connections:
+                t_class, ws_metadata = self.tradable_connections[(exchange, ticker)]
+                with ws_metadata["reports_lock"]:
+                    ws_metadata["order_reports"].pop("funding_collected", None)
+                    ws_metadata["order_reports"].pop("liquidated", None)
+                    ws_metadata["funding_collected"].clear()
+                return t_class, ws_metadata
+
+        ws_metadata = dict(orderbook={}, order_reports={}, balance_list={}, order_lock=threading.Lock(),
+                           balance_lock=threading.Lock(), reports_lock=threading.Lock(),
+                           fixed_point=self.get_fixed_point(exchange, ticker))
         auth_data = auth_data.copy()
         auth_data["symbol"] = ticker
-        t_class = tradable_class(auth_data)
-        ws_metadata["thread"] = t_class.get_websockets_handler(**ws_metadata)
+        t_class = self.tradable_classes[exchange](auth_data)
+        ws_metadata["thread"] = t_class.get_websockets_handler(ws_metadata["orderbook"], ws_metadata["order_reports"],
+                                                               ws_metadata["order_lock"], ws_metadata["reports_lock"],
+                                                               ws_metadata["balance_list"],
+                                                               ws_metadata["balance_lock"],
+                                                               ws_metadata["fixed_point"], self.book_max_depth,
+                                                               self.multiplex_streams)
+        ws_metadata["book_ready"] = ws_metadata["thread"].book_ready
+        ws_metadata["funding_collected"] = ws_metadata["thread"].funding_collected
         ws_metadata["thread"].daemon = True
         ws_metadata["thread"].start()
 
+        with self.connections_lock:
+            self.tradable_connections[(exchange, ticker)] = (t_class, ws_metadata)
         return t_class, ws_metadata
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+
+import aiohttp
+
+from libs.misc import runtime
+from libs.objects.OrderBook import OrderBook
+from libs.screener.exchanges.binance_async import AsyncBinance
+from libs.screener.exchanges.bybit_async import AsyncByBit
+from libs.screener.screener import ArbitrageChecker
+
+
+class AsyncArbitrageChecker(ArbitrageChecker):
+    async_exchange_classes = {
+        "Binance": AsyncBinance,
+        "ByBit": AsyncByBit
+    }
+    CONNECTIONS_LIMIT = 100
+    CONNECTIONS_LIMIT_PER_HOST = 20
+    REQUEST_TIMEOUT = 10
+
+    def __init__(self):
+        super().__init__()
+        self.loop = asyncio.new_event_loop()
+        self.session = None
+        self.async_exchanges = {}
+
+    @runtime
+    def find_arbitrage(self, usdt_amount, leverage, auth_data, exchange_capital=None, busy_legs=None):
+        return self.loop.run_until_complete(
+            self.find_arbitrage_async(usdt_amount, leverage, auth_data, exchange_capital, busy_legs))
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.CONNECTIONS_LIMIT,
+                                               limit_per_host=self.CONNECTIONS_LIMIT_PER_HOST),
+                timeout=aiohttp.ClientTimeout(total=self.REQUEST_TIMEOUT))
+        return self.session
+
+    async def get_async_exchange(self, exchange: str):
+        if exchange not in self.async_exchanges:
+            self.async_exchanges[exchange] = await self.async_exchange_classes[exchange].create(
+                await self.get_session(), self.auth_data.get(exchange))
+        return self.async_exchanges[exchange]
+
+    async def handle_exchanges_async(self, exchange: str):
+        ex = await self.get_async_exchange(exchange)
+        funding_table = self.funding_table(exchange)
+        if funding_table is not None:
+            return ex.get_funding_rate("USDT", funding_table), ex.exchange_name, ex.taker_fee
+        return await ex.get_funding_rate_async("USDT"), ex.exchange_name, ex.taker_fee
+
+    async def handle_depth_async(self, exchange: str, ticker: str) -> OrderBook | None:
+        ex = await self.get_async_exchange(exchange)
+        try:
+            order_book = await ex.get_futures_depth_async(ticker)
+        except (ConnectionError, aiohttp.ClientError, asyncio.TimeoutError):
+            logging.exception(f"Can't get order book {exchange} {ticker}")
+            return None
+        return OrderBook(ticker, order_book["bids"], order_book["asks"], 0)
+
+    async def handle_leverages_async(self, exchange: str, ticker: str, usdt_amount):
+        ex = await self.get_async_exchange(exchange)
+        return await ex.get_max_leverage_for_usdt_amount_async(ticker, usdt_amount)
+
+    async def find_arbitrage_async(self, usdt_amount, leverage, auth_data, exchange_capital=None, busy_legs=None):
+        self.auth_data = auth_data
+        collected_data = await asyncio.gather(
+            *(self.handle_exchanges_async(exchange) for exchange in self.async_exchange_classes))
+
+        funding_deltas_first_filter = self.select_opportunities(collected_data, usdt_amount, exchange_capital,
+                                                                busy_legs)
+        where_collect_prices = self.where_collect_prices(funding_deltas_first_filter)
+        keys = [(exchange, ticker) for exchange in where_collect_prices for ticker in where_collect_prices[exchange]]
+
+        tradables, multipliers, leverages, depths = await asyncio.gather(
+            asyncio.gather(*(asyncio.to_thread(self.init_tradable_classes_and_depth, exchange, ticker,
+                                               self.auth_data[exchange]) for exchange, ticker in keys)),
+            asyncio.gather(*(self.async_exchanges[exchange].get_multiplier_async(ticker) for exchange, ticker in keys)),
+            asyncio.gather(*(self.handle_leverages_async(exchange, ticker, usdt_amount) for exchange, ticker in keys)),
+            asyncio.gather(*(self.handle_depth_async(exchange, ticker) for exchange, ticker in keys)))
+
+        tradable_classes = {exchange: {} for exchange in where_collect_prices}
+        collected_multipliers = {exchange: {} for exchange in where_collect_prices}
+        collected_leverages = {exchange: {} for exchange in where_collect_prices}
+        collected_prices = {exchange: {} for exchange in where_collect_prices}
+        for idx, (exchange, ticker) in enumerate(keys):
+            tradable_classes[exchange][ticker] = tradables[idx]
+            collected_multipliers[exchange][ticker] = multipliers[idx]
+            collected_leverages[exchange][ticker] = leverages[idx]
+            if depths[idx] is not None:
+                collected_prices[exchange][ticker] = depths[idx]
+
+        await asyncio.gather(*(asyncio.to_thread(setter, *args)
+                               for arbitrage_opportunity in funding_deltas_first_filter
+                               for setter, args in self.leverage_setters(arbitrage_opportunity, tradable_classes,
+                                                                         collected_leverages, leverage)))
+
+        return self.evaluate_opportunities(funding_deltas_first_filter, tradable_classes, collected_prices,
+                                           collected_multipliers, collected_leverages, usdt_amount, leverage)
+
+    def close(self):
+        if self.session is not None and not self.session.closed:
+            self.loop.run_until_complete(self.session.close())
+        self.loop.close()
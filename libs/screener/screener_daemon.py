@@ -0,0 +1,151 @@
+import datetime
+import logging
+import threading
+from decimal import Decimal
+
+from libs.database_connector import DatabaseConnector
+from libs.screener.screener import ArbitrageChecker
+from libs.screener.screener_async import AsyncArbitrageChecker
+from libs.thread_with_return_value import ThreadWithReturnValue
+from libs.trade_executor import TradeLogic
+
+
+class ScreenerDaemon:
+    def __init__(self, main_config: dict, credentials: dict, bot_alert, scan_lead_secs: int = 120,
+                 warm_up_lead_secs: int = 600):
+        self.main_config = main_config
+        self.credentials = credentials
+        self.bot_alert = bot_alert
+        self.scan_lead_secs = scan_lead_secs
+        self.warm_up_lead_secs = warm_up_lead_secs
+        self.warm_pool_size = int(main_config.get("warm_pool_size", ArbitrageChecker.WARM_POOL_SIZE))
+        self.usdt_amount = Decimal(main_config["usdt_amount"])
+        self.leverage = Decimal(main_config["leverage"])
+        self.estimated_opportunity_threshold = Decimal(main_config["estimated_pnl"])
+        self.exchange_capital = main_config.get("exchange_capital")
+        self.arbitrage_checker = AsyncArbitrageChecker() if main_config.get("screener_async") else ArbitrageChecker()
+        self.arbitrage_checker.fixed_point_books = bool(main_config.get("fixed_point_books"))
+        self.arbitrage_checker.multiplex_streams = bool(main_config.get("multiplex_streams"))
+        if main_config.get("book_max_depth"):
+            self.arbitrage_checker.book_max_depth = int(main_config["book_max_depth"])
+        if main_config.get("funding_feed"):
+            self.arbitrage_checker.start_funding_feeds()
+        self.db = DatabaseConnector(main_config["db_connection_string"])
+        self.active_trades = {}
+        self.stopped = threading.Event()
+
+    def funding_times(self) -> list[int]:
+        funding_times = set()
+        for tradable_class in self.arbitrage_checker.tradable_classes.values():
+            funding_times.update(tradable_class.funding_times)
+        return sorted(funding_times)
+
+    def seconds_to_next_scan(self, now: datetime.datetime = None, lead_secs: int = None) -> float:
+        if now is None:
+            now = datetime.datetime.utcnow()
+        if lead_secs is None:
+            lead_secs = self.scan_lead_secs
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        seconds = (now - midnight).total_seconds()
+        for funding_time in self.funding_times() + [86400 + t for t in self.funding_times()]:
+            scan_time = funding_time - lead_secs
+            if scan_time > seconds:
+                return scan_time - seconds
+        return 0
+
+    @staticmethod
+    def trade_key(opportunity: list) -> tuple:
+        return opportunity[0][0], opportunity[2], opportunity[1][0], opportunity[3]
+
+    def busy_legs(self) -> set:
+        legs = set()
+        for key in self.active_trades:
+            legs.update({(key[0], key[1]), (key[2], key[3])})
+        return legs
+
+    def available_capital(self) -> dict | None:
+        if self.exchange_capital is None:
+            return None
+        available_capital = {exchange: Decimal(capital) for exchange, capital in self.exchange_capital.items()}
+        for key in self.active_trades:
+            for exchange in (key[0], key[2]):
+                if exchange in available_capital:
+                    available_capital[exchange] -= self.usdt_amount
+        return available_capital
+
+    def prune_finished_trades(self):
+        for key in list(self.active_trades.keys()):
+            if not self.active_trades[key].is_alive():
+                logging.info(f"Trade {key} finished")
+                self.active_trades.pop(key)
+
+    def start_trade(self, opportunity: list) -> ThreadWithReturnValue:
+        trade_logic = TradeLogic(opportunity[0], opportunity[1], opportunity[10], opportunity[14],
+                                 int(self.main_config["funding_timeout_secs"]), opportunity[5], opportunity[6],
+                                 None, self.bot_alert, db=self.db)
+        thread = ThreadWithReturnValue(
+            name=f"{opportunity[0][0]}_{opportunity[1][0]}",
+            target=trade_logic.execute_trade,
+            args=(opportunity[15], {opportunity[0][0]: opportunity[11], opportunity[1][0]: opportunity[12]}))
+        thread.start()
+        return thread
+
+    def scan(self) -> int:
+        self.prune_finished_trades()
+        busy_legs = self.busy_legs()
+        arbitrage_opportunities = self.arbitrage_checker.find_arbitrage(self.usdt_amount, self.leverage,
+                                                                        self.credentials, self.available_capital(),
+                                                                        busy_legs)
+        logging.info(arbitrage_opportunities)
+        started = 0
+        for opportunity in arbitrage_opportunities:
+            if opportunity[13] is None or opportunity[13] <= self.estimated_opportunity_threshold:
+                continue
+            key = self.trade_key(opportunity)
+            if (key[0], key[1]) in busy_legs or (key[2], key[3]) in busy_legs:
+                logging.info(f"Skip {key}: already in work")
+                continue
+            self.active_trades[key] = self.start_trade(opportunity)
+            busy_legs.update({(key[0], key[1]), (key[2], key[3])})
+            started += 1
+        return started
+
+    def run(self, scan_on_start: bool = True):
+        if scan_on_start:
+            self.safe_scan()
+        while not self.stopped.is_set():
+            wait_secs = self.seconds_to_next_scan()
+            warm_up_secs = self.seconds_to_next_scan(lead_secs=self.warm_up_lead_secs)
+            if self.warm_up_lead_secs > self.scan_lead_secs and warm_up_secs < wait_secs:
+                logging.info(f"Next warm up in {warm_up_secs:.0f} seconds")
+                if self.stopped.wait(warm_up_secs):
+                    break
+                self.safe_warm_up()
+                # do not warm up for the same funding window twice
+                self.stopped.wait(1)
+                continue
+            logging.info(f"Next scan in {wait_secs:.0f} seconds")
+            if self.stopped.wait(wait_secs):
+                break
+            self.safe_scan()
+            # do not rescan the same funding window twice
+            self.stopped.wait(1)
+
+    def safe_scan(self):
+        try:
+            started = self.scan()
+            logging.info(f"Scan finished, started {started} trades, active {len(self.active_trades)}")
+        except Exception:
+            logging.exception("something went wrong while checking arbitrage")
+
+    def safe_warm_up(self):
+        try:
+            self.prune_finished_trades()
+            watchlist = self.arbitrage_checker.warm_up(self.usdt_amount, self.leverage, self.credentials,
+                                                       self.warm_pool_size, self.busy_legs())
+            logging.info(f"Warm up finished, watching {len(watchlist)} candidates")
+        except Exception:
+            logging.exception("something went wrong while warming up connections")
+
+    def stop(self):
+        self.stopped.set()
@@ -0,0 +1,132 @@
+import json
+import logging
+import os
+import time
+from decimal import Decimal
+from threading import Lock
+
+from libs.objects.SymbolInfo import SymbolInfo
+from libs.rate_limiter import RateLimiter
+
+
+def load_binance_symbols() -> dict[str, SymbolInfo]:
+    req = RateLimiter.get_instance("Binance").get("https://fapi.binance.com/fapi/v1/exchangeInfo")
+    if req.status_code != 200:
+        raise ConnectionError(req.text)
+    symbols = {}
+    for symbol in req.json()["symbols"]:
+        filters = {exchange_filter["filterType"]: exchange_filter for exchange_filter in symbol["filters"]}
+        symbols[symbol["symbol"]] = SymbolInfo(
+            symbol=symbol["symbol"],
+            status=symbol["status"],
+            contract_type=symbol["contractType"],
+            step_size=Decimal(filters["LOT_SIZE"]["stepSize"]),
+            tick_size=Decimal(filters["PRICE_FILTER"]["tickSize"]),
+            min_qty=Decimal(filters["LOT_SIZE"]["minQty"]),
+            min_notional=Decimal(filters["MIN_NOTIONAL"]["notional"]) if "MIN_NOTIONAL" in filters else None,
+            leverage_step=Decimal("1")
+        )
+    return symbols
+
+
+def load_bybit_symbols() -> dict[str, SymbolInfo]:
+    symbols = {}
+    cursor = ""
+    while True:
+        req = RateLimiter.get_instance("ByBit").get(f"https://api.bybit.com/derivatives/v3/public/instruments-info"
+                                                    f"?category=linear&limit=1000&cursor={cursor}")
+        if req.status_code != 200:
+            raise ConnectionError(req.text)
+        req_json = req.json()
+        for symbol in req_json["result"]["list"]:
+            symbols[symbol["symbol"]] = SymbolInfo(
+                symbol=symbol["symbol"],
+                status=symbol["status"],
+                contract_type=symbol["contractType"],
+                step_size=Decimal(symbol["lotSizeFilter"]["qtyStep"]),
+                tick_size=Decimal(symbol["priceFilter"]["tickSize"]),
+                min_qty=Decimal(symbol["lotSizeFilter"]["minOrderQty"]),
+                max_leverage=Decimal(symbol["leverageFilter"]["maxLeverage"]),
+                leverage_step=Decimal(symbol["leverageFilter"]["leverageStep"])
+            )
+        cursor = req_json["result"].get("nextPageCursor", "")
+        if not cursor:
+            break
+    return symbols
+
+
+class SymbolsMetadata:
+    CACHE_DIR = "cache"
+    TTL = 3600
+
+    loaders = {
+        "Binance": load_binance_symbols,
+        "ByBit": load_bybit_symbols
+    }
+    __instances = {}
+    __instances_lock = Lock()
+
+    def __init__(self, exchange_name: str, ttl: int = TTL, cache_dir: str = CACHE_DIR):
+        self.exchange_name = exchange_name
+        self.ttl = ttl
+        self.cache_file = os.path.join(cache_dir, f"symbols_{exchange_name.lower()}.json")
+        self.symbols = {}
+        self.updated_at = 0
+        self.lock = Lock()
+
+    @classmethod
+    def get_instance(cls, exchange_name: str) -> "SymbolsMetadata":
+        with cls.__instances_lock:
+            if exchange_name not in cls.__instances:
+                cls.__instances[exchange_name] = cls(exchange_name)
+            return cls.__instances[exchange_name]
+
+    def is_expired(self) -> bool:
+        return self.updated_at + self.ttl < time.time()
+
+    def load_from_file(self) -> bool:
+        if not os.path.exists(self.cache_file):
+            return False
+        try:
+            with open(self.cache_file, "r") as cache_file:
+                data = json.load(cache_file)
+        except (OSError, ValueError):
+            logging.exception(f"Can't read symbols cache {self.cache_file}")
+            return False
+        if data["updated_at"] + self.ttl < time.time():
+            return False
+        self.symbols = {symbol: SymbolInfo.from_dict(info) for symbol, info in data["symbols"].items()}
+        self.updated_at = data["updated_at"]
+        return True
+
+    def save_to_file(self):
+        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+        tmp_file = self.cache_file + ".tmp"
+        with open(tmp_file, "w") as cache_file:
+            json.dump({"updated_at": self.updated_at,
+                       "symbols": {symbol: info.to_dict() for symbol, info in self.symbols.items()}},
+                      cache_file, default=str)
+        os.replace(tmp_file, self.cache_file)
+
+    def refresh(self, force: bool = False):
+        with self.lock:
+            if not force and not self.is_expired():
+                return
+            if not force and self.load_from_file():
+                return
+            self.symbols = self.loaders[self.exchange_name]()
+            self.updated_at = time.time()
+            try:
+                self.save_to_file()
+            except OSError:
+                logging.exception(f"Can't write symbols cache {self.cache_file}")
+
+    def get(self, symbol: str) -> SymbolInfo | None:
+        self.refresh()
+        return self.symbols.get(symbol)
+
+    def get_symbols(self, contract_type: str = None, status: str = None) -> list[str]:
+        self.refresh()
+        return [symbol for symbol, info in self.symbols.items()
+                if (contract_type is None or info.contract_type.lower() == contract_type.lower())
+                and (status is None or info.status.lower() == status.lower())]
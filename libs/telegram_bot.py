@@ -1,4 +1,4 @@
-import requests
+from libs.http_sessions import HttpSessions
 
 
 class BotAlert:
@@ -9,4 +9,5 @@ class BotAlert:
     def send_text_message(self, text):
         params = {"chat_id": str(self.chat_id),
                   "text": "{0}".format(text)}
-        requests.post("https://api.telegram.org/bot{0}/sendMessage".format(self.token), params=params)
+        HttpSessions.get_session("Telegram").post("https://api.telegram.org/bot{0}/sendMessage".format(self.token),
+                                                  params=params)
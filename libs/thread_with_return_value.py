@@ -6,14 +6,14 @@ class ThreadWithReturnValue(Thread):
         Thread.__init__(self, group, target, name, args, kwargs)
         self._return = None
         self._target = target
-        self._args = args
-        self._kwargs = kwargs
+        self._args = args if args is not None else ()
+        self._kwargs = kwargs if kwargs is not None else {}
     ex = None
 
     def run(self):
         if self._target is not None:
             try:
-                self._return = self._target(self._args, self._kwargs)
+                self._return = self._target(*self._args, **self._kwargs)
             except BaseException as e:
                 self.ex = e
 
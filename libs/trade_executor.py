@@ -2,9 +2,9 @@ import datetime
 import logging
 import time
 from decimal import Decimal
+from threading import Event
 
 from libs.database_connector import DatabaseConnector
-from libs.objects.OrderBook import OrderBook
 from libs.objects.OrderInfo import OrderInfo
 from libs.thread_with_return_value import ThreadWithReturnValue
 
@@ -16,10 +16,10 @@ class TradeLogic:
     }
 
     def __init__(self, exchange_1, exchange_2, token_amount, leverage, funding_timeout, funding_rate_1, funding_rate_2,
-                 db_connection_string, bot_alert):
+                 db_connection_string: str | None, bot_alert, db: DatabaseConnector = None):
         self.bot_alert = bot_alert
         self.funding_rate_1, self.funding_rate_2 = funding_rate_1, funding_rate_2
-        self.db = DatabaseConnector(db_connection_string)
+        self.db = db if db is not None else DatabaseConnector(db_connection_string)
         self.exchanges = {exchange_1[0]: exchange_1[1][0], exchange_2[0]: exchange_2[1][0]}
         self.ws_data = {exchange_1[0]: exchange_1[1][1], exchange_2[0]: exchange_2[1][1]}
         self.token_amount = token_amount
@@ -109,18 +109,14 @@ class TradeLogic:
 
     def wait_for_funding(self):
         self.mylogger.info("Wait for funding")
-        stop_checking_funding_list = []
-        while len(stop_checking_funding_list) != 2:
-            for exchange in self.exchanges:
-                if exchange in stop_checking_funding_list:
-                    continue
-                if self.exchanges[exchange].funding_timeout(self.funding_timeout):
-                    self.mylogger.info(f"Exchange {exchange} funding check closed by timeout")
-                    stop_checking_funding_list.append(exchange)
-                with self.ws_data[exchange]["reports_lock"]:
-                    if "funding_collected" in self.ws_data[exchange]["order_reports"]:
-                        self.mylogger.info(f"Exchange {exchange} funding check closed by WS")
-                        stop_checking_funding_list.append(exchange)
+        deadlines = {exchange: time.time() + self.exchanges[exchange].seconds_to_funding_timeout(self.funding_timeout)
+                     for exchange in self.exchanges}
+        for exchange in self.exchanges:
+            # set by the user data stream when a funding fee of this symbol is booked on the account
+            if self.ws_data[exchange]["funding_collected"].wait(max(0., deadlines[exchange] - time.time())):
+                self.mylogger.info(f"Exchange {exchange} funding check closed by WS")
+            else:
+                self.mylogger.info(f"Exchange {exchange} funding check closed by timeout")
 
     @staticmethod
     def handle_fok_orders(orders):
@@ -154,48 +150,66 @@ class TradeLogic:
         order_books = {}
         close_prices = {}
         delta_usdt = {}
-        while True:
-            for exchange in self.exchange_names:
-                with self.ws_data[exchange]["order_lock"]:
-                    if len({"bids", "asks", "timestamp"}.intersection(
-                            set(self.ws_data[exchange]["orderbook"].keys()))) != 3:
+        last_seq = {}
+        last_delta = None
+        close_timeout = 7 * 3600 + 54 * 60
+        book_changed = Event()
+        for exchange in self.exchange_names:
+            self.ws_data[exchange]["thread"].add_book_listener(book_changed.set)
+        try:
+            while True:
+                # cleared before reading, so a version published during the pass wakes the next wait
+                book_changed.clear()
+                changed = False
+                for exchange in self.exchange_names:
+                    snapshot = self.ws_data[exchange]["orderbook"].get("snapshot")
+                    if snapshot is None or last_seq.get(exchange) == snapshot.seq:
+                        continue
+                    last_seq[exchange] = snapshot.seq
+                    order_books[exchange] = snapshot.order_book()
+
+                    calculated_data = order_books[exchange].calculate(
+                        route=self.TRADE_INSTRUCTION[exchange_routes[exchange]][1]["route"],
+                        amount=self.token_amount
+                    )
+                    close_prices[exchange] = calculated_data[0] if calculated_data is not None else -1
+
+                    if close_prices[exchange] == -1:
+                        logging.info(f"Not enough in depth on {exchange}")
+                        delta_usdt.pop(exchange, None)
                         continue
-                    order_books[exchange] = OrderBook(asks=self.ws_data[exchange]["orderbook"]["asks"],
-                                                      bids=self.ws_data[exchange]["orderbook"]["bids"],
-                                                      timestamp=self.ws_data[exchange]["orderbook"]["timestamp"],
-                                                      symbol="")
-
-                calculated_data = order_books[self.exchange_names[0]].calculate(
-                    route=self.TRADE_INSTRUCTION[exchange_routes[exchange]][1]["route"],
-                    amount=self.token_amount
-                )
-                close_prices[exchange] = calculated_data[0] if calculated_data is not None else -1
-
-                if close_prices[exchange] == -1:
-                    logging.info(f"Not enough in depth on {exchange}")
-                    continue
-
-                if exchange_routes[exchange] == "long":
-                    delta_usdt[exchange] = self.token_amount * (close_prices[exchange] - open_prices[exchange])
-                else:
-                    delta_usdt[exchange] = self.token_amount * (open_prices[exchange] - close_prices[exchange])
-
-                if self.time_threshold(funding_time, 7 * 3600 + 54 * 60):
+
+                    if exchange_routes[exchange] == "long":
+                        delta = self.token_amount * (close_prices[exchange] - open_prices[exchange])
+                    else:
+                        delta = self.token_amount * (open_prices[exchange] - close_prices[exchange])
+                    if delta_usdt.get(exchange) != delta:
+                        delta_usdt[exchange] = delta
+                        changed = True
+
+                if changed and len(delta_usdt) == len(self.exchange_names):
+                    total_delta = sum(delta_usdt.values())
+                    if total_delta != last_delta:
+                        last_delta = total_delta
+                        self.log_close_books(delta_usdt, order_books)
+                    if total_delta >= 0:
+                        return close_prices
+
+                book_changed.wait(max(0., funding_time + close_timeout - time.time()))
+                if self.time_threshold(funding_time, close_timeout):
                     return None
-            time.sleep(0.1)
-            self.mylogger.info(
-                f"Deltas {self.exchange_names[0]}: {delta_usdt[self.exchange_names[0]]}, "
-                f"{self.exchange_names[1]}: {delta_usdt[self.exchange_names[1]]} ")
-            self.mylogger.info(
-                f"Orderbook {self.exchange_names[0]}: bid {order_books[self.exchange_names[0]].bids[0][0]}, "
-                f"ask {order_books[self.exchange_names[0]].asks[0][0]} "
-                f"ts {order_books[self.exchange_names[0]].timestamp}")
+        finally:
+            for exchange in self.exchange_names:
+                self.ws_data[exchange]["thread"].remove_book_listener(book_changed.set)
+
+    def log_close_books(self, delta_usdt, order_books):
+        self.mylogger.info(
+            f"Deltas {self.exchange_names[0]}: {delta_usdt[self.exchange_names[0]]}, "
+            f"{self.exchange_names[1]}: {delta_usdt[self.exchange_names[1]]} ")
+        for exchange in self.exchange_names:
             self.mylogger.info(
-                f"Orderbook {self.exchange_names[1]}: bid {order_books[self.exchange_names[1]].bids[0][0]}, "
-                f"ask {order_books[self.exchange_names[1]].asks[0][0]} "
-                f"ts {order_books[self.exchange_names[1]].timestamp}")
-            if sum(delta_usdt.values()) >= 0:
-                return close_prices
+                f"Orderbook {exchange}: bid {order_books[exchange].price('bids')}, "
+                f"ask {order_books[exchange].price('asks')} ts {order_books[exchange].timestamp}")
 
     def collect_pnl_info(self, start_place_order_ts, end_place_order_ts):
         total_pnl = 0
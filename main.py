@@ -3,7 +3,14 @@ import logging
 import time
 from decimal import Decimal
 
+from libs.exchanges.request_engine import SignedRequestEngine
+from libs.exchanges.ws.decoder import set_decoder
+from libs.exchanges.ws.journal import Journal
+from libs.http_sessions import HttpSessions
+from libs.rate_limiter import BinanceRateLimiter, ByBitRateLimiter, RateLimiter
 from libs.screener.screener import ArbitrageChecker
+from libs.screener.screener_async import AsyncArbitrageChecker
+from libs.screener.screener_daemon import ScreenerDaemon
 from libs.telegram_bot import BotAlert
 from libs.thread_with_return_value import ThreadWithReturnValue
 from libs.trade_executor import TradeLogic
@@ -18,13 +25,44 @@ logging.getLogger().setLevel(logging.INFO)
 logging.getLogger().addHandler(logging.StreamHandler())
 logging.Formatter(fmt='%(asctime)s.%(msecs)03d', datefmt='%Y-%m-%d,%H:%M:%S')
 
+set_decoder(main_config.get("json_decoder"))
+Journal.DIRECTORY = main_config.get("journal_dir", Journal.DIRECTORY)
+Journal.SEGMENT_BYTES = int(main_config.get("journal_segment_mb", 64)) * 1024 * 1024
+Journal.SEGMENT_SECS = int(main_config.get("journal_segment_secs", Journal.SEGMENT_SECS))
+Journal.COMPRESS = bool(main_config.get("journal_compress"))
+Journal.MAX_SEGMENTS = int(main_config.get("journal_max_segments", Journal.MAX_SEGMENTS))
+HttpSessions.POOL_SIZE = int(main_config.get("http_pool_size", HttpSessions.POOL_SIZE))
+HttpSessions.CONNECT_TIMEOUT = float(main_config.get("http_connect_timeout_secs", HttpSessions.CONNECT_TIMEOUT))
+HttpSessions.READ_TIMEOUT = float(main_config.get("http_read_timeout_secs", HttpSessions.READ_TIMEOUT))
+SignedRequestEngine.DEADLINE = float(main_config.get("rest_deadline_secs", SignedRequestEngine.DEADLINE))
+RateLimiter.RESERVE = float(main_config.get("rate_limit_reserve", RateLimiter.RESERVE))
+BinanceRateLimiter.WEIGHT_LIMIT = int(main_config.get("binance_weight_limit", BinanceRateLimiter.WEIGHT_LIMIT))
+BinanceRateLimiter.ORDER_LIMIT = int(main_config.get("binance_order_limit", BinanceRateLimiter.ORDER_LIMIT))
+ByBitRateLimiter.MARKET_LIMIT = int(main_config.get("bybit_market_limit", ByBitRateLimiter.MARKET_LIMIT))
+
 USDT_AMOUNT = Decimal(main_config["usdt_amount"])
 LEVERAGE = Decimal(main_config["leverage"])
 ESTIMATED_OPPORTUNITY_THRESHOLD = Decimal(main_config["estimated_pnl"])
 
+if main_config.get("screener_mode", "once") == "daemon":
+    screener_daemon = ScreenerDaemon(main_config, credentials,
+                                     BotAlert(main_config["chatid"], main_config["bot_token"]),
+                                     int(main_config.get("scan_lead_secs", 120)),
+                                     int(main_config.get("warm_up_lead_secs", 600)))
+    try:
+        screener_daemon.run()
+    except KeyboardInterrupt:
+        screener_daemon.stop()
+    exit()
+
 try:
-    arbitrage_checker = ArbitrageChecker()
-    arbitrage_opportunities = arbitrage_checker.find_arbitrage(USDT_AMOUNT, LEVERAGE, credentials)
+    arbitrage_checker = AsyncArbitrageChecker() if main_config.get("screener_async") else ArbitrageChecker()
+    arbitrage_checker.fixed_point_books = bool(main_config.get("fixed_point_books"))
+    arbitrage_checker.multiplex_streams = bool(main_config.get("multiplex_streams"))
+    if main_config.get("book_max_depth"):
+        arbitrage_checker.book_max_depth = int(main_config["book_max_depth"])
+    arbitrage_opportunities = arbitrage_checker.find_arbitrage(USDT_AMOUNT, LEVERAGE, credentials,
+                                                               main_config.get("exchange_capital"))
     logging.info(arbitrage_opportunities)
 except BaseException as e:
     logging.exception("something went wrong while checking arbitrage")
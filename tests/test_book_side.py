@@ -0,0 +1,66 @@
+from decimal import Decimal
+from threading import Lock
+
+from libs.exchanges.ws.binance import Binance
+from libs.objects.BookSide import BookSide
+
+MAX_DEPTH = 5
+LEVELS = 100
+
+
+def bid_levels() -> list:
+    return [[Decimal(1000 - i), Decimal(1)] for i in range(LEVELS)]
+
+
+def test_price_drift_depletes_truncated_side():
+    bids = BookSide(True, bid_levels(), MAX_DEPTH)
+    for tick in range(LEVELS):
+        # the price walks down: the best bid is taken and a new level appears far below, past the boundary
+        bids.update(Decimal(1000 - tick), Decimal(0))
+        bids.update(Decimal(1000 - tick - LEVELS), Decimal(1))
+    assert len(bids) == 0
+    assert bids.depleted()
+
+
+def test_untruncated_side_is_never_depleted():
+    bids = BookSide(True, bid_levels())
+    for tick in range(LEVELS):
+        bids.update(Decimal(1000 - tick), Decimal(0))
+    assert not bids.depleted()
+
+
+def test_binance_resyncs_depleted_book():
+    handler = Binance("", "Binance", {}, {}, "BTCUSDT", Lock(), Lock(), "", "", Lock(), {}, "", max_depth=MAX_DEPTH)
+    handler.request_snapshot = lambda: None
+    handler.orderbook.update({"bids": BookSide(True, bid_levels(), MAX_DEPTH),
+                              "asks": BookSide(False, [[Decimal(2000), Decimal(1)]], MAX_DEPTH),
+                              "lastUpdateId": 0, "timestamp": 0})
+    handler.updates = 1
+    for tick in range(LEVELS):
+        handler.handle_depth_update({"U": tick + 1, "u": tick + 1, "pu": tick, "E": 0,
+                                     "b": [[str(1000 - tick), "0"]], "a": []})
+        if handler.updates == 0:
+            break
+    assert handler.updates == 0
+    assert handler.resyncs == 1
+    assert "lastUpdateId" not in handler.orderbook
+
+
+def test_truncated_snapshot_ignores_updates_below_it():
+    # a REST snapshot that filled the requested limit, with no room left to trim
+    bids = BookSide(True, bid_levels()[:2 * MAX_DEPTH], MAX_DEPTH, truncated=True)
+    bids.update(Decimal(900), Decimal(1))
+    for tick in range(MAX_DEPTH + 1):
+        bids.update(Decimal(1000 - tick), Decimal(0))
+    assert Decimal(900) not in [level[0] for level in bids.levels]
+    assert bids.depleted()
+
+
+def test_full_snapshot_without_max_depth_has_a_boundary():
+    bids = BookSide(True, bid_levels(), truncated=True)
+    bids.update(Decimal(1000 - LEVELS - 1), Decimal(1))
+    assert len(bids) == LEVELS
+    for tick in range(LEVELS):
+        assert not bids.depleted()
+        bids.update(Decimal(1000 - tick), Decimal(0))
+    assert bids.depleted()
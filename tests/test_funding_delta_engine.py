@@ -0,0 +1,61 @@
+import itertools
+import random
+from decimal import Decimal
+
+from libs.funding_calculator import calculate_delta
+from libs.screener.funding_delta_engine import FundingDeltaEngine
+
+EXCHANGES = ("Binance", "ByBit", "OKX")
+SYMBOLS = 40
+
+
+def collected(seed: int) -> dict:
+    rng = random.Random(seed)
+    collected_dict = {}
+    for exchange in EXCHANGES:
+        funding = {}
+        for idx in range(SYMBOLS):
+            if rng.random() < 0.2:
+                continue
+            # zero rates and equal rates hit the special cases of calculate_delta
+            rate = rng.choice([Decimal(0), Decimal("0.01"), Decimal(rng.randint(-2000, 2000)) / 10000])
+            funding[f"S{idx}USDT"] = {"funding_rate": rate, "original_symbol": f"S{idx}USDT{exchange}"}
+        collected_dict[exchange] = {"funding": funding, "fee": rng.choice(["0.02", "0.04", "0.06"])}
+    return collected_dict
+
+
+def reference_rows(collected_dict: dict) -> list:
+    """The pair by pair Decimal loop the engine replaces."""
+    rows = []
+    for ex1, ex2 in itertools.combinations(collected_dict, 2):
+        for symbol in collected_dict[ex1]["funding"].keys() & collected_dict[ex2]["funding"].keys():
+            funding_1, funding_2 = collected_dict[ex1]["funding"][symbol], collected_dict[ex2]["funding"][symbol]
+            fee_1, fee_2 = Decimal(collected_dict[ex1]["fee"]), Decimal(collected_dict[ex2]["fee"])
+            rows.append([ex1, ex2, funding_1["original_symbol"], funding_2["original_symbol"],
+                         funding_1["funding_rate"], funding_2["funding_rate"],
+                         calculate_delta(funding_1["funding_rate"], funding_2["funding_rate"], 0, 0),
+                         calculate_delta(funding_1["funding_rate"], funding_2["funding_rate"], fee_1, fee_2),
+                         fee_1, fee_2])
+    return rows
+
+
+def test_engine_matches_calculate_delta():
+    for seed in range(5):
+        collected_dict = collected(seed)
+        engine = FundingDeltaEngine(collected_dict)
+        ranking = engine.rank()
+        for candidate in ranking:
+            funding_1 = collected_dict[str(candidate["exchange_1"])]["funding"][str(candidate["symbol"])]
+            funding_2 = collected_dict[str(candidate["exchange_2"])]["funding"][str(candidate["symbol"])]
+            expected = calculate_delta(funding_1["funding_rate"], funding_2["funding_rate"], 0, 0)
+            assert abs(candidate["delta_without_fee"] - float(expected)) < 1e-9
+        assert list(ranking["delta_with_fee"]) == sorted(ranking["delta_with_fee"], reverse=True)
+        rows = engine.to_rows(ranking)
+        assert sorted(rows, key=lambda row: row[:4]) == sorted(reference_rows(collected_dict), key=lambda row: row[:4])
+
+
+def test_min_delta_filter_keeps_the_same_candidates():
+    collected_dict = collected(7)
+    engine = FundingDeltaEngine(collected_dict)
+    expected = {tuple(row[:4]) for row in reference_rows(collected_dict) if row[7] > Decimal("0.1")}
+    assert {tuple(row[:4]) for row in engine.to_rows(engine.rank(0.1))} == expected
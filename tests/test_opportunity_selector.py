@@ -0,0 +1,47 @@
+import itertools
+import random
+from decimal import Decimal
+
+from libs.screener.opportunity_selector import OpportunitySelector
+
+EXCHANGES = ("Binance", "ByBit", "OKX")
+USDT_AMOUNT = Decimal(100)
+
+
+def candidates(rng: random.Random, count: int) -> list:
+    rows = []
+    for _ in range(count):
+        ex1, ex2 = rng.sample(EXCHANGES, 2)
+        symbol = f"S{rng.randint(0, 5)}USDT"
+        rows.append([ex1, ex2, symbol, symbol, 0, 0, 0, Decimal(rng.randint(1, 100)) / 100, 0, 0])
+    return rows
+
+
+def brute_force(rows: list, selector: OpportunitySelector) -> Decimal:
+    best = Decimal(0)
+    for size in range(1, len(rows) + 1):
+        for selection in itertools.combinations(rows, size):
+            legs = [leg for row in selection for leg in selector.legs(row)]
+            exchanges = [exchange for row in selection for exchange in row[:2]]
+            if len(set(legs)) == len(legs) and \
+                    all(exchanges.count(exchange) <= selector.capacity(exchange) for exchange in exchanges):
+                best = max(best, sum(row[7] for row in selection))
+    return best
+
+
+def test_branch_and_bound_matches_brute_force():
+    rng = random.Random(1)
+    for _ in range(30):
+        rows = candidates(rng, 10)
+        exchange_capital = {exchange: USDT_AMOUNT * rng.randint(1, 3) for exchange in EXCHANGES}
+        for capital in (None, exchange_capital):
+            selector = OpportunitySelector(USDT_AMOUNT, capital)
+            selected = selector.select(rows)
+            assert sum(row[7] for row in selected) == brute_force(rows, selector)
+
+
+def test_busy_legs_are_skipped():
+    rows = [["Binance", "ByBit", "AUSDT", "AUSDT", 0, 0, 0, Decimal(1), 0, 0],
+            ["Binance", "OKX", "BUSDT", "BUSDT", 0, 0, 0, Decimal("0.5"), 0, 0]]
+    selected = OpportunitySelector(USDT_AMOUNT).select(rows, busy_legs={("ByBit", "AUSDT")})
+    assert selected == [rows[1]]
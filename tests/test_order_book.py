@@ -0,0 +1,71 @@
+import random
+from decimal import Decimal
+
+from libs.objects.FixedPoint import FixedPoint
+from libs.objects.OrderBook import OrderBook
+
+LEVELS = 50
+
+
+def book_levels(seed: int) -> tuple[list, list]:
+    rng = random.Random(seed)
+    asks = [[Decimal(100) + Decimal(i) / 100, Decimal(rng.randint(1, 5000)) / 1000] for i in range(1, LEVELS + 1)]
+    bids = [[Decimal(100) - Decimal(i) / 100, Decimal(rng.randint(1, 5000)) / 1000] for i in range(LEVELS)]
+    return bids, asks
+
+
+def walk(levels: list, amount: Decimal, in_usdt: bool = False):
+    """The level by level walk the prefix sums replace."""
+    left, filled_qty, filled_notional = amount, Decimal(0), Decimal(0)
+    for price, qty in levels:
+        take = min(left, qty * price if in_usdt else qty)
+        filled_qty += take / price if in_usdt else take
+        filled_notional += take if in_usdt else take * price
+        left -= take
+        if left == 0:
+            if in_usdt:
+                return price, amount / filled_qty, filled_qty
+            return price, filled_notional / amount, filled_notional
+    return None
+
+
+def amounts(levels: list, in_usdt: bool = False) -> list:
+    cumulative = Decimal(0)
+    result = [Decimal("0.001")]
+    for price, qty in levels:
+        level = qty * price if in_usdt else qty
+        # inside a level and exactly at its end
+        result += [cumulative + level / 2, cumulative + level]
+        cumulative += level
+    return result + [cumulative + 1]
+
+
+def test_prefix_sums_match_level_walk():
+    bids, asks = book_levels(1)
+    book = OrderBook("BTCUSDT", bids, asks, 0)
+    for route, levels in (("BUY", asks), ("SELL", bids)):
+        for amount in amounts(levels):
+            assert book.calculate(route, amount) == walk(levels, amount)
+        for amount in amounts(levels, True):
+            expected = walk(levels, amount, True)
+            result = book.calculate_for_usdt(route, amount)
+            assert (result is None) == (expected is None)
+            if result is not None:
+                assert result[0] == expected[0]
+                assert abs(result[2] - expected[2]) < Decimal("1e-20")
+
+
+def test_fixed_point_book_matches_decimal_book():
+    bids, asks = book_levels(2)
+    fixed_point = FixedPoint(2, 3)
+    book = OrderBook("BTCUSDT", bids, asks, 0)
+    fixed_book = OrderBook("BTCUSDT", [fixed_point.parse_level(level) for level in bids],
+                           [fixed_point.parse_level(level) for level in asks], 0, fixed_point)
+    for route, levels in (("BUY", asks), ("SELL", bids)):
+        assert fixed_book.price("asks" if route == "BUY" else "bids") == levels[0][0]
+        for amount in amounts(levels):
+            # quantities come in whole steps
+            amount = amount.quantize(Decimal("0.001"))
+            assert fixed_book.calculate(route, amount) == book.calculate(route, amount)
+        for amount in amounts(levels, True):
+            assert fixed_book.calculate_for_usdt(route, amount) == book.calculate_for_usdt(route, amount)
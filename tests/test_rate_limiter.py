@@ -0,0 +1,40 @@
+import time
+from threading import Thread
+
+from libs.rate_limiter import BinanceRateLimiter, TokenBucket
+
+
+def test_reserve_is_left_for_orders():
+    bucket = TokenBucket(10, 1000, reserve=0.2)
+    assert bucket.acquire(8, TokenBucket.MARKET_DATA)
+    assert not bucket.acquire(1, TokenBucket.MARKET_DATA, timeout=0.05)
+    assert not bucket.acquire(1, TokenBucket.ACCOUNT, timeout=0.05)
+    assert bucket.acquire(2, TokenBucket.ORDER, timeout=0.05)
+
+
+def test_order_waiter_goes_before_market_data():
+    bucket = TokenBucket(1, 1000)
+    assert bucket.acquire(1, TokenBucket.ORDER)
+    results = []
+    waiter = Thread(target=lambda: results.append(bucket.acquire(1, TokenBucket.ORDER, timeout=5)))
+    waiter.start()
+    while not bucket.waiting[TokenBucket.ORDER]:
+        time.sleep(0.001)
+    bucket.release(1)
+    assert not bucket.acquire(1, TokenBucket.MARKET_DATA, timeout=0.05)
+    waiter.join()
+    assert results == [True]
+
+
+def test_release_is_capped_at_capacity():
+    bucket = TokenBucket(10, 1000)
+    assert bucket.acquire(3)
+    bucket.release(5)
+    assert bucket.available() == 10
+
+
+def test_failed_acquire_refunds_earlier_buckets():
+    limiter = BinanceRateLimiter()
+    limiter.bucket("orders").sync(BinanceRateLimiter.ORDER_LIMIT, reset_in=30)
+    assert not limiter.acquire("POST", "/fapi/v1/order", timeout=0.05)
+    assert limiter.bucket("weight").available() == BinanceRateLimiter.WEIGHT_LIMIT